@@ -0,0 +1,65 @@
+import argparse
+import json
+import time
+
+import main
+from main import MYSQL_CONFIG, db_connection, insert_extracted_rows
+
+# Measure /save-to-db insert throughput against a local MySQL: one INSERT per
+# row (the old path) versus chunked multi-row inserts. Benchmark rows are
+# deleted afterwards.
+
+parser = argparse.ArgumentParser(description="extracted_data insert throughput")
+parser.add_argument("--rows", type=int, default=20000, help="Rows to insert per run")
+parser.add_argument("--chunk-size", type=int, default=main.DB_INSERT_CHUNK_SIZE, help="Rows per batch")
+args = parser.parse_args()
+main.DB_INSERT_CHUNK_SIZE = args.chunk_size
+
+rows = [
+    {"District": f"District {i % 40}", "Crime": "Theft", "Cases": str(i % 97), "Month": "2024-01"}
+    for i in range(args.rows)
+]
+
+
+def per_row(cursor, log_id):
+    for row in rows:
+        cursor.execute("""
+            INSERT INTO extracted_data (extraction_log_id, row_data)
+            VALUES (%s, %s)
+        """, (log_id, json.dumps(row)))
+
+
+def batched(cursor, log_id):
+    insert_extracted_rows(cursor, log_id, rows)
+
+
+print("--- extracted_data Insert Throughput ---")
+print(f"Host: {MYSQL_CONFIG['host']}  Database: {MYSQL_CONFIG['database']}")
+print(f"Rows: {args.rows}  Chunk size: {args.chunk_size}")
+
+with db_connection() as connection:
+    if not connection:
+        raise SystemExit("Could not connect to MySQL. Please check your .env configuration.")
+    
+    cursor = connection.cursor()
+    for name, insert in (("one INSERT per row", per_row), ("batched executemany", batched)):
+        cursor.execute("""
+            INSERT INTO extraction_logs
+            (filename, extraction_method, rows_count, columns_count, status)
+            VALUES (%s, %s, %s, %s, %s)
+        """, ("benchmark", "benchmark", args.rows, 4, 'benchmark'))
+        log_id = cursor.lastrowid
+        connection.commit()
+        
+        started = time.perf_counter()
+        insert(cursor, log_id)
+        connection.commit()
+        elapsed = time.perf_counter() - started
+        
+        print(f"\n{name}:")
+        print(f"   {elapsed:.2f} s, {args.rows / elapsed:,.0f} rows/sec")
+        
+        cursor.execute("DELETE FROM extracted_data WHERE extraction_log_id = %s", (log_id,))
+        cursor.execute("DELETE FROM extraction_logs WHERE id = %s", (log_id,))
+        connection.commit()
+    cursor.close()
@@ -0,0 +1,62 @@
+import argparse
+import io
+import sys
+import time
+
+import pdfplumber
+
+import main
+from bench_suite import build_report_pdf
+
+# Compare the two pdfplumber table detectors on a generated corpus: the
+# TableFinder that ships with pdfplumber and the NumPy detect_tables. Pages
+# are parsed once and rebuilt from page-cache snapshots for every run, so
+# only table finding and cell text are timed, not PDF parsing. Both must
+# return the same tables (bbox and rows) on every page.
+
+parser = argparse.ArgumentParser(description="pdfplumber vs numpy table detector")
+parser.add_argument("--pages", type=int, default=10, help="Pages per generated PDF")
+parser.add_argument("--rows-per-page", type=int, default=30, help="Table rows per page")
+parser.add_argument("--tables-per-page", type=int, default=2, help="Tables on every page")
+parser.add_argument("--runs", type=int, default=3, help="Timed runs per detector")
+args = parser.parse_args()
+
+SETTINGS = (
+    ("lattice", None),
+    ("text", main.PDFPLUMBER_TEXT_SETTINGS),
+)
+
+
+def pdfplumber_tables(page, table_settings):
+    settings = pdfplumber.table.TableSettings.resolve(table_settings)
+    return [(table.bbox, table.extract(**settings.text_settings)) for table in page.find_tables(settings)]
+
+
+def best_of(detector, snapshots, table_settings):
+    times = []
+    for _ in range(args.runs):
+        pages = [main.page_from_snapshot(snapshot) for snapshot in snapshots]
+        started = time.perf_counter()
+        found = [detector(page, table_settings) for page in pages]
+        times.append(time.perf_counter() - started)
+    return min(times), found
+
+
+print("--- Table Detector ---")
+print(f"Python: {sys.version.split()[0]}  Pages: {args.pages}  Tables per page: {args.tables_per_page}  Runs: {args.runs}")
+
+for layout in ("ruled", "unruled"):
+    pdf = build_report_pdf(pages=args.pages, rows_per_page=args.rows_per_page,
+                           ruled=layout == "ruled", tables_per_page=args.tables_per_page, seed=3)
+    with pdfplumber.open(io.BytesIO(pdf)) as document:
+        snapshots = [main.page_snapshot(page) for page in document.pages]
+
+    for name, table_settings in SETTINGS:
+        plumber_time, expected = best_of(pdfplumber_tables, snapshots, table_settings)
+        numpy_time, found = best_of(main.detect_tables, snapshots, table_settings)
+        if found != expected:
+            raise SystemExit(f"{layout}, {name}: the numpy detector found different tables")
+        tables = sum(len(page_tables) for page_tables in found)
+        print(f"\n{layout}, {name} ({tables} tables, same output):")
+        print(f"   pdfplumber: {plumber_time * 1000:,.0f} ms best of {args.runs}")
+        print(f"   numpy:      {numpy_time * 1000:,.0f} ms best of {args.runs} ({plumber_time / numpy_time:.1f}x)")
@@ -0,0 +1,101 @@
+import argparse
+import random
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from main import rows_to_frame, tables_to_frame
+
+# Time the normalize stage on generated crime-report rows: pdfplumber-style
+# rows with the header repeated at every page break, and tabula-style page
+# tables whose later pages lost their header. Compares the plain
+# concatenation, the vectorized normalize path and a per-row Python loop
+# doing the same cleaning. Plain concatenation of the tabula tables is only
+# sized, not run: every headerless page adds columns of its own.
+
+parser = argparse.ArgumentParser(description="Table normalization throughput")
+parser.add_argument("--rows", type=int, default=100000, help="Data rows per input")
+parser.add_argument("--rows-per-page", type=int, default=50, help="Rows between repeated headers")
+parser.add_argument("--runs", type=int, default=3, help="Timed runs per variant")
+args = parser.parse_args()
+
+random.seed(7)
+HEADER = ["District", "Crime", "Cases", "Arrests", "Reported"]
+DISTRICTS = ["Central", "North Side", "Harbor", "Airport", "Old Town"]
+CRIMES = ["Theft", "Assault", "Burglary", "Fraud"]
+
+data = [
+    [
+        f" {random.choice(DISTRICTS)}\n",
+        random.choice(CRIMES),
+        f"{random.randint(0, 25000):,}",
+        str(random.randint(0, 500)),
+        f"{random.randint(1, 28):02d}/{random.randint(1, 12):02d}/2024"
+    ]
+    for _ in range(args.rows)
+]
+
+# pdfplumber: one header per page, the first one is the document header
+rows = []
+for first in range(0, len(data), args.rows_per_page):
+    rows.append(list(HEADER))
+    rows.extend(data[first:first + args.rows_per_page])
+
+# tabula: the first page has the header, later pages had none so tabula
+# took their first data row as the header
+tables = [pd.DataFrame(data[:args.rows_per_page], columns=HEADER)]
+for first in range(args.rows_per_page, len(data), args.rows_per_page):
+    page = data[first:first + args.rows_per_page]
+    tables.append(pd.DataFrame(page[1:], columns=page[0]))
+
+
+def row_loop(rows):
+    """The same cleaning one row at a time, for comparison"""
+    header = [cell.strip() for cell in rows[0]]
+    records = []
+    for row in rows[1:]:
+        cells = [" ".join(cell.split()) if isinstance(cell, str) else cell for cell in row]
+        if cells == header:
+            continue
+        records.append({
+            "District": cells[0],
+            "Crime": cells[1],
+            "Cases": int(cells[2].replace(",", "")),
+            "Arrests": int(cells[3]),
+            "Reported": datetime.strptime(cells[4], "%d/%m/%Y")
+        })
+    return pd.DataFrame(records)
+
+
+def best_of(func, *func_args):
+    times = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        result = func(*func_args)
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+print("--- Table Normalization ---")
+print(f"Rows: {args.rows}  Rows per page: {args.rows_per_page}  Runs: {args.runs}")
+
+variants = (
+    ("pdfplumber rows, plain", rows_to_frame, rows),
+    ("pdfplumber rows, normalize", lambda rows: rows_to_frame(rows, normalize=True), rows),
+    ("pdfplumber rows, per-row loop", row_loop, rows),
+    ("tabula tables, normalize", lambda tables: tables_to_frame(tables, normalize=True), tables),
+)
+
+for name, func, source in variants:
+    elapsed, df = best_of(func, source)
+    types = ", ".join(f"{column}:{dtype}" for column, dtype in list(df.dtypes.items())[:8])
+    if df.shape[1] > 8:
+        types += ", ..."
+    print(f"\n{name}:")
+    print(f"   Time:    {elapsed * 1000:,.0f} ms best of {args.runs} ({len(df) / elapsed:,.0f} rows/s)")
+    print(f"   Result:  {len(df):,} rows x {df.shape[1]} columns")
+    print(f"   Types:   {types}")
+
+columns = set().union(*(table.columns for table in tables))
+print(f"\ntabula tables, plain: would be {len(data) - len(tables) + 1:,} rows x {len(columns):,} columns")
@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import main
+from bench_suite import build_report_pdf
+
+# Time repeated pdfplumber passes over one generated PDF, the way /extract
+# falls back to pdfplumber and /extract-pdfplumber retries it: the first pass
+# parses every page, later ones (other table settings, a page subset) take
+# the parsed pages from the page cache. Each run uses a fresh document hash,
+# and the same passes run once more without a hash as the uncached baseline.
+# Run it from the repository directory, the worker fork server imports main
+# from there.
+
+parser = argparse.ArgumentParser(description="Parsed page cache: first vs repeated pdfplumber passes")
+parser.add_argument("--pages", type=int, default=40, help="Pages in the generated PDF")
+parser.add_argument("--rows-per-page", type=int, default=30, help="Table rows per page")
+parser.add_argument("--layout", choices=["ruled", "unruled"], default="ruled")
+parser.add_argument("--runs", type=int, default=3, help="Timed runs per variant")
+args = parser.parse_args()
+
+PASSES = (
+    ("lattice, all pages", None, False),
+    ("text, all pages", main.PDFPLUMBER_TEXT_SETTINGS, False),
+    ("lattice, first 5 pages", None, True),
+)
+
+
+async def run_passes(pdf_path, content_hash):
+    main.document_hash.set(content_hash)
+    pages = list(range(1, args.pages + 1))
+    times = []
+    for _, settings, subset in PASSES:
+        started = time.perf_counter()
+        await main.run_pdfplumber(pdf_path, pages[:5] if subset else pages, settings)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+async def bench(pdf_path):
+    cached = []
+    uncached = []
+    for run in range(args.runs):
+        cached.append(await run_passes(pdf_path, f"bench-{run}"))
+        uncached.append(await run_passes(pdf_path, None))
+    return cached, uncached
+
+
+if __name__ == "__main__":
+    pdf = build_report_pdf(pages=args.pages, rows_per_page=args.rows_per_page,
+                           ruled=args.layout == "ruled", tables_per_page=2)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(pdf)
+
+    main.start_worker_pools()
+    main.start_fork_server()
+    try:
+        cached, uncached = asyncio.run(bench(tmp.name))
+    finally:
+        main.stop_worker_pools()
+        os.unlink(tmp.name)
+
+    print("--- Parsed Page Cache ---")
+    print(f"Python: {sys.version.split()[0]}  Pages: {args.pages}  Layout: {args.layout}  Runs: {args.runs}")
+    print(f"Cache: {main.page_cache.stats()}")
+    for index, (name, _, _) in enumerate(PASSES):
+        with_cache = min(times[index] for times in cached)
+        without_cache = min(times[index] for times in uncached)
+        print(f"\n{name}:")
+        print(f"   Page cache: {with_cache * 1000:,.0f} ms best of {args.runs}")
+        print(f"   No cache:   {without_cache * 1000:,.0f} ms best of {args.runs}")
@@ -0,0 +1,101 @@
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Measure cold start: launch uvicorn the way the deployments do and time
+# how long it takes until /health answers (liveness) and until /ready
+# returns 200 (fork server up, tabula boot finished). Also times the bare
+# "import main" that every start pays first.
+
+parser = argparse.ArgumentParser(description="Cold-start time to /health and /ready")
+parser.add_argument("--runs", type=int, default=5, help="Server starts to time")
+parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for /ready")
+args = parser.parse_args()
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def answers(url):
+    """HTTP status of url, None while nothing is listening"""
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def time_import():
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", "import main"],
+        cwd=HERE, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return time.perf_counter() - started
+
+
+def time_start():
+    """Seconds from launching uvicorn to the first /health and the first 200 from /ready"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=HERE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    health = None
+    ready = None
+    try:
+        while time.perf_counter() - started < args.timeout:
+            if server.poll() is not None:
+                raise SystemExit("The API server exited during startup")
+            if health is None and answers(f"{url}/health") == 200:
+                health = time.perf_counter() - started
+            if health is not None and answers(f"{url}/ready") == 200:
+                ready = time.perf_counter() - started
+                break
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+    return health, ready
+
+
+print("--- Cold Start ---")
+print(f"Python: {sys.version.split()[0]}  Runs: {args.runs}")
+
+imports = [time_import() for _ in range(args.runs)]
+starts = [time_start() for _ in range(args.runs)]
+health_times = [health for health, _ in starts if health is not None]
+ready_times = [ready for _, ready in starts if ready is not None]
+
+
+def report(name, times):
+    if not times:
+        print(f"   {name:<16} never")
+        return
+    print(f"   {name:<16} median {statistics.median(times) * 1000:,.0f} ms, "
+          f"min {min(times) * 1000:,.0f} ms, max {max(times) * 1000:,.0f} ms")
+
+
+print()
+report("import main", imports)
+report("first /health", health_times)
+report("/ready 200", ready_times)
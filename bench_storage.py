@@ -0,0 +1,111 @@
+import argparse
+import json
+import time
+
+from main import (
+    MYSQL_CONFIG, db_connection, encode_columnar,
+    insert_extracted_rows, load_columnar_rows
+)
+
+# Compare the two STORAGE_MODE layouts against a local MySQL: one JSON
+# document per row in extracted_data versus one Parquet blob per extraction
+# in extraction_blobs. Reports stored bytes, write time and full read time.
+# Benchmark rows are deleted afterwards.
+
+parser = argparse.ArgumentParser(description="extracted_data vs extraction_blobs storage")
+parser.add_argument("--rows", type=int, default=20000, help="Rows per extraction")
+parser.add_argument("--runs", type=int, default=3, help="Reads timed per layout")
+args = parser.parse_args()
+
+rows = [
+    {"District": f"District {i % 40}", "Crime": "Theft", "Cases": str(i % 97), "Month": "2024-01"}
+    for i in range(args.rows)
+]
+
+
+def write_rows(cursor, log_id):
+    insert_extracted_rows(cursor, log_id, rows)
+
+
+def read_rows(connection, log_id):
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT row_data FROM extracted_data WHERE extraction_log_id = %s
+    """, (log_id,))
+    data = [json.loads(row[0]) for row in cursor.fetchall()]
+    cursor.close()
+    return data
+
+
+def size_rows(cursor, log_id):
+    cursor.execute("""
+        SELECT SUM(JSON_STORAGE_SIZE(row_data)) FROM extracted_data
+        WHERE extraction_log_id = %s
+    """, (log_id,))
+    return int(cursor.fetchone()[0])
+
+
+def write_columnar(cursor, log_id):
+    column_schema, blob = encode_columnar(rows)
+    cursor.execute("""
+        INSERT INTO extraction_blobs (extraction_log_id, format, column_schema, data)
+        VALUES (%s, %s, %s, %s)
+    """, (log_id, 'parquet', json.dumps(column_schema), blob))
+
+
+def read_columnar(connection, log_id):
+    return load_columnar_rows(connection, log_id)
+
+
+def size_columnar(cursor, log_id):
+    cursor.execute("""
+        SELECT LENGTH(data) FROM extraction_blobs WHERE extraction_log_id = %s
+    """, (log_id,))
+    return int(cursor.fetchone()[0])
+
+
+print("--- Extraction Storage Layouts ---")
+print(f"Host: {MYSQL_CONFIG['host']}  Database: {MYSQL_CONFIG['database']}")
+print(f"Rows: {args.rows}  Reads per layout: {args.runs}")
+
+layouts = (
+    ("rows (extracted_data JSON)", write_rows, read_rows, size_rows),
+    ("columnar (extraction_blobs Parquet)", write_columnar, read_columnar, size_columnar),
+)
+
+with db_connection() as connection:
+    if not connection:
+        raise SystemExit("Could not connect to MySQL. Please check your .env configuration.")
+    
+    cursor = connection.cursor(buffered=True)
+    for name, write, read, size in layouts:
+        cursor.execute("""
+            INSERT INTO extraction_logs
+            (filename, extraction_method, rows_count, columns_count, status)
+            VALUES (%s, %s, %s, %s, %s)
+        """, ("benchmark", "benchmark", args.rows, 4, 'benchmark'))
+        log_id = cursor.lastrowid
+        connection.commit()
+        
+        started = time.perf_counter()
+        write(cursor, log_id)
+        connection.commit()
+        write_elapsed = time.perf_counter() - started
+        
+        read_times = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            data = read(connection, log_id)
+            read_times.append(time.perf_counter() - started)
+        assert data == rows, "read back different rows"
+        
+        print(f"\n{name}:")
+        print(f"   Stored: {size(cursor, log_id) / 1024:,.0f} KiB")
+        print(f"   Write:  {write_elapsed:.2f} s")
+        print(f"   Read:   {min(read_times) * 1000:.0f} ms best of {args.runs}")
+        
+        cursor.execute("DELETE FROM extracted_data WHERE extraction_log_id = %s", (log_id,))
+        cursor.execute("DELETE FROM extraction_blobs WHERE extraction_log_id = %s", (log_id,))
+        cursor.execute("DELETE FROM extraction_logs WHERE id = %s", (log_id,))
+        connection.commit()
+    cursor.close()
@@ -0,0 +1,465 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+
+# Benchmark the extraction endpoints over a synthetic crime-report corpus.
+#
+# Generates tabular PDFs locally (page count, rows per page, ruled or
+# unruled tables, several tables per page) and runs each one through the
+# /extract, /extract-tabula and /extract-pdfplumber code paths, in-process
+# and/or over HTTP against a uvicorn server started for the run (or --url).
+# Prints throughput, p50/p95/p99 latency and peak RSS as JSON.
+#
+#   python bench_suite.py --pages 20 --rows-per-page 30 --layouts ruled,unruled
+#   python bench_suite.py --mode http --concurrency 4 --output run.json
+
+ENDPOINTS = ["extract", "extract-tabula", "extract-pdfplumber"]
+
+DISTRICTS = ["North", "South", "East", "West", "Central", "Harbor", "Airport", "Hills"]
+CRIMES = ["Theft", "Burglary", "Assault", "Robbery", "Fraud", "Vandalism", "Arson"]
+COLUMNS = ["District", "Crime", "Cases", "Arrests", "Month"]
+
+
+def build_report_pdf(pages=10, rows_per_page=25, ruled=True, tables_per_page=1, seed=0) -> bytes:
+    """Build a crime-report style PDF with tables_per_page tables on every page
+
+    Each table has a header row followed by its share of rows_per_page rows.
+    Ruled tables get full cell borders (lattice), unruled ones only text.
+    """
+    rng = random.Random(seed)
+    row_height = 14
+    column_width = 100
+    left = 50
+
+    page_streams = []
+    for page in range(pages):
+        ops = []
+        top = 750
+        for table in range(tables_per_page):
+            body_rows = rows_per_page // tables_per_page + (table < rows_per_page % tables_per_page)
+            cells = [COLUMNS] + [
+                [
+                    rng.choice(DISTRICTS),
+                    rng.choice(CRIMES),
+                    str(rng.randint(0, 500)),
+                    str(rng.randint(0, 100)),
+                    f"2024-{rng.randint(1, 12):02d}"
+                ]
+                for _ in range(body_rows)
+            ]
+
+            ops.append(f"BT /F1 11 Tf {left} {top} Td (Report page {page + 1} table {table + 1}) Tj ET")
+            top -= 10
+            if ruled:
+                right = left + column_width * len(COLUMNS)
+                bottom = top - row_height * len(cells)
+                for r in range(len(cells) + 1):
+                    ops.append(f"{left} {top - r * row_height} m {right} {top - r * row_height} l S")
+                for c in range(len(COLUMNS) + 1):
+                    ops.append(f"{left + c * column_width} {top} m {left + c * column_width} {bottom} l S")
+            for r, row in enumerate(cells):
+                for c, text in enumerate(row):
+                    ops.append(
+                        f"BT /F1 9 Tf {left + c * column_width + 4} "
+                        f"{top - r * row_height - 10} Td ({text}) Tj ET"
+                    )
+            top -= row_height * len(cells) + 30
+        page_streams.append("\n".join(ops).encode("latin-1"))
+
+    page_count = len(page_streams)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(page_count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, stream in enumerate(page_streams):
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref_offset
+    )
+    return bytes(pdf)
+
+
+def unique_copy(pdf: bytes) -> bytes:
+    """Append a comment after %%EOF so every request misses the result cache"""
+    return pdf + f"% run {uuid.uuid4().hex}\n".encode()
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of a list, q in 0..100"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def proc_status_mb(pid, field):
+    """A memory field (VmHWM, VmRSS) of /proc/<pid>/status in MB, None if unreadable"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def descendants(pid):
+    """Every process below pid: children, their children (fork server workers) and so on"""
+    found = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        try:
+            for task in os.listdir(f"/proc/{parent}/task"):
+                with open(f"/proc/{parent}/task/{task}/children") as f:
+                    for child in f.read().split():
+                        found.append(int(child))
+                        pending.append(int(child))
+        except OSError:
+            pass
+    return found
+
+
+class PeakRss:
+    """Peak RSS of a process and of its whole process tree during a run
+
+    Extraction workers are short-lived grandchildren (forked by the fork
+    server) that are gone when the run ends, so the tree is walked every
+    interval seconds from a background thread. Reports the process's own
+    VmHWM, the largest sum of VmRSS over all descendants at one time, the
+    largest single worker VmHWM and how many descendants were seen. Falls
+    back to getrusage for this process where /proc is not available.
+    """
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.worker_peaks = {}
+        self.tree_peak = 0.0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        total = 0.0
+        for child in descendants(self.pid):
+            peak = proc_status_mb(child, "VmHWM")
+            if peak is not None:
+                self.worker_peaks[child] = max(self.worker_peaks.get(child, 0.0), peak)
+            total += proc_status_mb(child, "VmRSS") or 0.0
+        self.tree_peak = max(self.tree_peak, total)
+
+    def result(self):
+        own = proc_status_mb(self.pid, "VmHWM")
+        if own is None and self.pid == os.getpid():
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+            own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+        return {
+            "process": round(own, 1) if own is not None else None,
+            "workers": round(self.tree_peak, 1),
+            "largest_worker": round(max(self.worker_peaks.values(), default=0.0), 1),
+            "worker_count": len(self.worker_peaks)
+        }
+
+
+def summarize(mode, endpoint, layout, pages, samples, wall_seconds):
+    """Aggregate one (mode, endpoint, layout) run into a result record"""
+    ok = [sample for sample in samples if sample["ok"]]
+    latencies = [sample["ms"] for sample in ok]
+    rows = sum(sample["rows"] for sample in ok)
+    return {
+        "mode": mode,
+        "endpoint": endpoint,
+        "layout": layout,
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "error": next((sample["error"] for sample in samples if not sample["ok"]), None),
+        "rows_per_request": ok[0]["rows"] if ok else 0,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 1) if latencies else None,
+            "p50": round(percentile(latencies, 50), 1) if latencies else None,
+            "p95": round(percentile(latencies, 95), 1) if latencies else None,
+            "p99": round(percentile(latencies, 99), 1) if latencies else None,
+        },
+        "throughput": {
+            "requests_per_sec": round(len(ok) / wall_seconds, 2),
+            "pages_per_sec": round(len(ok) * pages / wall_seconds, 1),
+            "rows_per_sec": round(rows / wall_seconds, 1),
+        },
+    }
+
+
+async def run_inprocess(corpus, args):
+    """Call the extraction code the endpoints use, without HTTP or the cache"""
+    import main
+
+    async def extract(path):
+        return await main.run_extraction(path)
+
+    async def extract_tabula(path):
+        tables = await main.run_tabula(path)
+        if not tables:
+            return {"status": "no_tables"}
+        return main.frame_result(main.tables_to_frame(tables), "tabula", with_method=False)
+
+    async def extract_pdfplumber(path):
+        rows = await main.run_pdfplumber(path)
+        if not rows:
+            return {"status": "no_tables"}
+        return main.frame_result(main.rows_to_frame(rows), "pdfplumber", with_method=False)
+
+    handlers = {
+        "extract": extract,
+        "extract-tabula": extract_tabula,
+        "extract-pdfplumber": extract_pdfplumber,
+    }
+
+    main.start_worker_pools()
+    main.start_tabula_engine()
+    results = []
+    try:
+        with PeakRss(os.getpid()) as peak_rss:
+            for layout, path in corpus.items():
+                for endpoint in args.endpoints:
+                    handler = handlers[endpoint]
+                    semaphore = asyncio.Semaphore(args.concurrency)
+
+                    async def one():
+                        async with semaphore:
+                            started = time.perf_counter()
+                            try:
+                                result = await handler(path)
+                                return {
+                                    "ok": True,
+                                    "ms": (time.perf_counter() - started) * 1000,
+                                    "rows": result.get("rows", 0)
+                                }
+                            except Exception as e:
+                                return {"ok": False, "error": str(e)}
+
+                    for _ in range(args.warmup):
+                        await one()
+                    started = time.perf_counter()
+                    samples = await asyncio.gather(*[one() for _ in range(args.runs)])
+                    wall = time.perf_counter() - started
+                    results.append(summarize("inprocess", endpoint, layout, args.pages, samples, wall))
+        peak = peak_rss.result()
+    finally:
+        main.stop_worker_pools()
+    return results, peak
+
+
+def post_pdf(url, pdf: bytes):
+    """POST a PDF as multipart/form-data and return the decoded JSON body"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="report.pdf"\r\n'
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + pdf + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(
+        url,
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    with urllib.request.urlopen(request, timeout=600) as response:
+        return json.loads(response.read())
+
+
+def start_server():
+    """Start uvicorn on a free port and wait for /ready, returning (process, url)"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("The API server exited during startup")
+        try:
+            with urllib.request.urlopen(f"{url}/ready", timeout=2):
+                return server, url
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise SystemExit("The API server did not become ready in time")
+
+
+def run_http(corpus_bytes, args):
+    """Send the corpus to a running API over HTTP"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    server = None
+    url = args.url
+    if not url:
+        server, url = start_server()
+
+    def one(endpoint, pdf):
+        started = time.perf_counter()
+        try:
+            result = post_pdf(f"{url.rstrip('/')}/{endpoint}", unique_copy(pdf))
+            return {"ok": True, "ms": (time.perf_counter() - started) * 1000, "rows": result.get("rows", 0)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    results = []
+    try:
+        with PeakRss(server.pid) if server else contextlib.nullcontext() as peak_rss:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                for layout, pdf in corpus_bytes.items():
+                    for endpoint in args.endpoints:
+                        for _ in range(args.warmup):
+                            one(endpoint, pdf)
+                        started = time.perf_counter()
+                        samples = list(pool.map(lambda _: one(endpoint, pdf), range(args.runs)))
+                        wall = time.perf_counter() - started
+                        results.append(summarize("http", endpoint, layout, args.pages, samples, wall))
+        peak = peak_rss.result() if server else None
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+    return results, peak
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Extraction benchmark over a synthetic PDF corpus")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per PDF")
+    parser.add_argument("--rows-per-page", type=int, default=25, help="Table rows per page")
+    parser.add_argument("--tables-per-page", type=int, default=1, help="Tables per page")
+    parser.add_argument("--layouts", default="ruled,unruled", help="Comma list of ruled, unruled")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma list of endpoints to run")
+    parser.add_argument("--mode", choices=["inprocess", "http", "both"], default="both")
+    parser.add_argument("--url", help="Benchmark an already running API instead of starting one")
+    parser.add_argument("--runs", type=int, default=10, help="Timed requests per endpoint and layout")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed requests before each series")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight at once")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated table contents")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    args.endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    layouts = [layout.strip() for layout in args.layouts.split(",") if layout.strip()]
+    for endpoint in args.endpoints:
+        if endpoint not in ENDPOINTS:
+            parser.error(f"unknown endpoint {endpoint}")
+    for layout in layouts:
+        if layout not in ("ruled", "unruled"):
+            parser.error(f"unknown layout {layout}")
+
+    corpus_bytes = {
+        layout: build_report_pdf(
+            args.pages, args.rows_per_page, layout == "ruled", args.tables_per_page, args.seed
+        )
+        for layout in layouts
+    }
+    corpus_dir = tempfile.mkdtemp(prefix="bench_corpus_")
+    corpus = {}
+    for layout, pdf in corpus_bytes.items():
+        corpus[layout] = os.path.join(corpus_dir, f"{layout}.pdf")
+        with open(corpus[layout], "wb") as f:
+            f.write(pdf)
+
+    report = {
+        "config": {
+            "pages": args.pages,
+            "rows_per_page": args.rows_per_page,
+            "tables_per_page": args.tables_per_page,
+            "layouts": layouts,
+            "endpoints": args.endpoints,
+            "runs": args.runs,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "pdf_bytes": {layout: len(pdf) for layout, pdf in corpus_bytes.items()},
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "tabula_mode": os.getenv("TABULA_MODE", "jpype"),
+        },
+        "results": [],
+        "peak_rss_mb": {},
+    }
+
+    try:
+        # HTTP first, so the server's numbers are not skewed by this
+        # process having loaded the JVM and worker pools
+        if args.mode in ("http", "both"):
+            results, peak = run_http(corpus_bytes, args)
+            report["results"].extend(results)
+            report["peak_rss_mb"]["http_server"] = peak
+        if args.mode in ("inprocess", "both"):
+            # main prints its startup messages, keep stdout for the report
+            with contextlib.redirect_stdout(sys.stderr):
+                results, peak = asyncio.run(run_inprocess(corpus, args))
+            report["results"].extend(results)
+            report["peak_rss_mb"]["inprocess"] = peak
+    finally:
+        for path in corpus.values():
+            os.unlink(path)
+        os.rmdir(corpus_dir)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main_cli()
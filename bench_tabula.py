@@ -0,0 +1,61 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import tabula
+
+from main import TABULA_OPTIONS, build_self_check_pdf
+
+# Compare tabula latency with the in-process JVM against a java launch per call.
+# The jpype runs must go first: once tabula-py switches to subprocess mode it
+# stays there for the rest of the Python process.
+
+parser = argparse.ArgumentParser(description="Tabula latency: jpype vs subprocess")
+parser.add_argument("pdf", nargs="?", help="PDF to extract (defaults to a built-in sample)")
+parser.add_argument("--runs", type=int, default=5, help="Timed runs per mode")
+args = parser.parse_args()
+
+if args.pdf:
+    pdf_path = args.pdf
+else:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(build_self_check_pdf())
+        pdf_path = tmp.name
+
+
+def time_mode(force_subprocess):
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        tabula.read_pdf(pdf_path, force_subprocess=force_subprocess, **TABULA_OPTIONS)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+print(f"--- Tabula Latency ({args.runs} runs per mode) ---")
+print(f"PDF: {args.pdf or 'built-in sample'}")
+
+try:
+    # First call boots the JVM, report it separately
+    started = time.perf_counter()
+    tabula.read_pdf(pdf_path, **TABULA_OPTIONS)
+    print(f"\nJVM boot + first extraction: {(time.perf_counter() - started) * 1000:.1f} ms")
+    
+    results = {
+        "jpype": time_mode(False),
+        "subprocess": time_mode(True)
+    }
+    
+    for mode, timings in results.items():
+        print(f"\n{mode}:")
+        print(f"   mean:   {statistics.mean(timings):.1f} ms")
+        print(f"   median: {statistics.median(timings):.1f} ms")
+        print(f"   min:    {min(timings):.1f} ms")
+    
+    speedup = statistics.median(results["subprocess"]) / statistics.median(results["jpype"])
+    print(f"\njpype is {speedup:.1f}x faster than subprocess (median)")
+finally:
+    if not args.pdf and os.path.exists(pdf_path):
+        os.unlink(pdf_path)
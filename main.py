@@ -1,83 +1,3405 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from __future__ import annotations
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request, Query
 from pydantic import BaseModel
-from fastapi.responses import JSONResponse, HTMLResponse
-import tabula
-import pdfplumber
-import pandas as pd
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, FileResponse, Response
 import tempfile
 import os
-from typing import Dict, Any, List
-import mysql.connector
-from mysql.connector import Error
+import asyncio
+import contextvars
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
 from dotenv import load_dotenv
+from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+import io
 import json
-from datetime import datetime
+import re
+import time
+import hashlib
+import pickle
+import sqlite3
+import uuid
+import zipfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+# pandas, numpy, tabula and pdfplumber are imported where they are used, so
+# the app starts serving before they load (see startup_event)
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Load environment variables
+load_dotenv()
+
+# MySQL Configuration
+MYSQL_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', 'localhost'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', ''),
+    'database': os.getenv('MYSQL_DATABASE', 'crime_reports')
+}
+
+# MySQL connection pool settings
+MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', 5))
+MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', 5))
+
+# Rows sent per multi-row INSERT when saving extracted data
+DB_INSERT_CHUNK_SIZE = int(os.getenv('DB_INSERT_CHUNK_SIZE', 1000))
+
+# How extracted rows are stored: "rows" writes one JSON document per row to
+# extracted_data, "columnar" writes one Parquet blob per extraction to
+# extraction_blobs (needs pyarrow)
+STORAGE_MODE = os.getenv('STORAGE_MODE', 'rows').lower()
+
+# Rows fetched from MySQL per round trip by /extraction/{id}/export
+EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', 1000))
+
+# Page sizes for /extractions and /extraction/{id}
+EXTRACTIONS_PAGE_LIMIT = int(os.getenv('EXTRACTIONS_PAGE_LIMIT', 50))
+EXTRACTION_ROWS_PAGE_LIMIT = int(os.getenv('EXTRACTION_ROWS_PAGE_LIMIT', 1000))
+
+# Tabula engine configuration
+# "jpype" keeps one JVM alive inside this process, "subprocess" launches java per call
+TABULA_MODE = os.getenv('TABULA_MODE', 'jpype').lower()
+
+# Default tabula options shared by every endpoint
+TABULA_OPTIONS = {
+    'pages': 'all',
+    'lattice': True,
+    'multiple_tables': True,
+    'silent': True
+}
+
+# Options for tabula's stream mode (borderless tables) and pdfplumber's
+# text-alignment table finder, picked by the pre-scan below
+TABULA_STREAM_OPTIONS = {
+    'lattice': False,
+    'stream': True
+}
+PDFPLUMBER_TEXT_SETTINGS = {
+    'vertical_strategy': 'text',
+    'horizontal_strategy': 'text'
+}
+
+# Page objects, and their attributes, that pdfplumber's table finding reads;
+# page snapshots in the page cache keep only these
+SNAPSHOT_OBJECT_TYPES = ('char', 'line', 'rect', 'curve')
+SNAPSHOT_ATTRS = ('object_type', 'text', 'upright', 'pts', 'x0', 'x1', 'y0', 'y1',
+                  'top', 'bottom', 'doctop', 'width', 'height')
+
+# Edge records of the numpy table detector, and the largest crossing grid
+# (columns x rows x max(columns, rows)) it handles before leaving a page to
+# pdfplumber
+EDGE_FIELDS = [('x0', 'f8'), ('x1', 'f8'), ('top', 'f8'), ('bottom', 'f8'),
+               ('width', 'f8'), ('height', 'f8'), ('orientation', 'U1')]
+DETECTOR_MAX_GRID = 20_000_000
+
+# Pre-scan that picks the extraction engine: pages sampled per document and
+# ruling lines/rects a page needs to count as holding a ruled table
+PRESCAN_SAMPLE_PAGES = int(os.getenv('PRESCAN_SAMPLE_PAGES', 3))
+PRESCAN_MIN_RULINGS = int(os.getenv('PRESCAN_MIN_RULINGS', 4))
+
+# Default /extract strategy: "auto" tries the pre-scan's engines one after
+# another, "race" starts them all at once and keeps the first result that
+# passes the quality check
+EXTRACTION_STRATEGY = os.getenv('EXTRACTION_STRATEGY', 'auto').lower()
+
+# Share of rows that must have the most common column count for a race
+# result to pass the quality check
+RACE_MIN_CONSISTENCY = float(os.getenv('RACE_MIN_CONSISTENCY', 0.8))
+
+# Default of the normalize option: drop repeated header rows, line up the
+# columns of every table, strip whitespace and turn number and date columns
+# into real numbers and ISO dates
+NORMALIZE_TABLES = os.getenv('NORMALIZE_TABLES', 'false').lower() == 'true'
+
+# Cells read as numbers when normalizing: thousands separators, a currency
+# sign and accounting-style negatives such as (1,200)
+NUMBER_PATTERN = r"\(?-?[$€£]?\d[\d,]*(\.\d+)?\)?"
+
+# Date layouts tried, in order, on text columns when normalizing
+NORMALIZE_DATE_FORMATS = [
+    '%Y-%m-%d', '%d.%m.%Y', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d',
+    '%d-%b-%Y', '%d %b %Y', '%b %d, %Y', '%d %B %Y', '%B %d, %Y'
+]
+
+# State of the long-lived tabula engine, filled in at startup
+tabula_engine = {
+    'mode': TABULA_MODE,
+    'ready': False,
+    'startup_ms': None,
+    'self_check': 'pending',
+    'hung_calls': 0
+}
+tabula_hung_lock = threading.Lock()
+
+# Extraction worker pools
+# pdfplumber is CPU-bound and runs in worker processes (one supervisor
+# thread each), tabula waits on the JVM and runs in threads
+PDFPLUMBER_WORKERS = int(os.getenv('PDFPLUMBER_WORKERS', os.cpu_count() or 1))
+TABULA_WORKERS = int(os.getenv('TABULA_WORKERS', 4))
+
+# Page-sharded pdfplumber: split long PDFs across this many worker processes,
+# keeping at least PDFPLUMBER_MIN_SHARD_PAGES pages per shard
+PDFPLUMBER_PAGE_WORKERS = int(os.getenv('PDFPLUMBER_PAGE_WORKERS', PDFPLUMBER_WORKERS))
+PDFPLUMBER_MIN_SHARD_PAGES = int(os.getenv('PDFPLUMBER_MIN_SHARD_PAGES', 10))
+
+# Table detector of the pdfplumber engine: "pdfplumber" runs its TableFinder,
+# "numpy" the array-based detect_tables (same tables, less time per page)
+PDFPLUMBER_TABLE_DETECTOR = os.getenv('PDFPLUMBER_TABLE_DETECTOR', 'pdfplumber').lower()
+
+# Result cache for repeated uploads of the same PDF
+RESULT_CACHE_MEMORY_MB = int(os.getenv('RESULT_CACHE_MEMORY_MB', 64))
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', '')  # empty disables the disk tier
+RESULT_CACHE_DISK_MB = int(os.getenv('RESULT_CACHE_DISK_MB', 1024))
+
+# Parsed pdfplumber pages kept in the API process by upload content hash, so
+# later passes over the same document (pdfplumber fallback, /extract-pdfplumber
+# retry) find tables without parsing the PDF again; 0 disables
+PAGE_CACHE_MEMORY_MB = int(os.getenv('PAGE_CACHE_MEMORY_MB', 128))
+
+# Uploads are streamed to disk in chunks and rejected past MAX_UPLOAD_MB
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', 250))
+
+# Pages extracted per engine call when streaming NDJSON
+STREAM_PAGE_BATCH = int(os.getenv('STREAM_PAGE_BATCH', 5))
+
+# Background extraction jobs, kept in SQLite so they survive a restart
+JOBS_DIR = os.getenv('JOBS_DIR', 'jobs')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+
+# Finished and failed jobs, with their result files, are deleted this many
+# hours after they end (0 keeps them)
+JOB_RETENTION_HOURS = float(os.getenv('JOB_RETENTION_HOURS', 24))
+
+# A job still running when the server died is requeued on start-up until it
+# has been started this many times, then marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+
+# /extract turns uploads larger than this into background jobs (0 disables)
+ASYNC_JOB_THRESHOLD_MB = float(os.getenv('ASYNC_JOB_THRESHOLD_MB', 0))
+
+# PDFs from one /extract-batch request extracted at the same time
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', max(PDFPLUMBER_WORKERS, 2)))
+
+# Most PDFs, and most uncompressed megabytes, one ZIP of /extract-batch may
+# hold; checked against the archive's directory before anything is unpacked
+ZIP_MAX_FILES = int(os.getenv('ZIP_MAX_FILES', 200))
+ZIP_MAX_TOTAL_MB = int(os.getenv('ZIP_MAX_TOTAL_MB', 1024))
+
+# Extractions allowed in flight before new ones get 503 + Retry-After
+EXTRACTION_QUEUE_LIMIT = int(os.getenv('EXTRACTION_QUEUE_LIMIT', 16))
+RETRY_AFTER_SECONDS = int(os.getenv('RETRY_AFTER_SECONDS', 10))
+
+# Limits for one extraction, enforced by running it in worker processes
+# that are killed when they go over (0 disables a limit). In jpype mode
+# tabula runs inside the API process: it still gets a 504 on timeout, but
+# only TABULA_MODE=subprocess makes the tabula call itself killable. After
+# TABULA_MAX_HUNG_CALLS jpype calls are still running past their timeout,
+# tabula switches to subprocess mode for good (0 never switches).
+TABULA_MAX_HUNG_CALLS = int(os.getenv('TABULA_MAX_HUNG_CALLS', 2))
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv('EXTRACTION_TIMEOUT_SECONDS', 300))
+EXTRACTION_MAX_RSS_MB = int(os.getenv('EXTRACTION_MAX_RSS_MB', 2048))
+MAX_PDF_PAGES = int(os.getenv('MAX_PDF_PAGES', 5000))
+
+worker_pools = {
+    'pdfplumber': None,
+    'tabula': None
+}
+worker_context = None
+extraction_deadline = contextvars.ContextVar('extraction_deadline', default=None)
+# Content hash of the upload being extracted, the page cache key
+document_hash = contextvars.ContextVar('document_hash', default=None)
+extractions_in_flight = 0
+
+job_workers = []
+job_wakeup = None
+
+# Startup work done in the background once the app serves requests, reported
+# by /ready: the worker fork server, the tabula boot and the MySQL schema
+readiness = {
+    'workers': False,
+    'tabula': False,
+    'database': False
+}
+background_tasks = []
+tabula_booted = None
+
+# Prometheus metrics, served by /metrics
+# Stages: upload_read, temp_write, tabula, pdfplumber, dataframe
+# (concat/fillna), normalize, serialization (DataFrame to records/JSON),
+# db_insert
+STAGE_SECONDS = Histogram(
+    'pdf_extraction_stage_seconds',
+    'Time spent in each extraction stage',
+    ['stage'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+EXTRACTIONS_TOTAL = Counter(
+    'pdf_extractions_total',
+    'Extractions by the method that produced the result',
+    ['method']
+)
+FALLBACKS_TOTAL = Counter(
+    'pdf_extraction_fallbacks_total',
+    'Engines that failed or found nothing, handing over to the next engine'
+)
+LIMIT_KILLS_TOTAL = Counter(
+    'pdf_extraction_limit_kills_total',
+    'Worker processes killed for going over an extraction limit',
+    ['limit']
+)
+ENGINE_CHOICES_TOTAL = Counter(
+    'pdf_engine_choices_total',
+    'First engine picked by the pre-scan',
+    ['engine']
+)
+PAGES_TOTAL = Counter(
+    'pdf_pages_processed_total',
+    'PDF pages handed to each engine',
+    ['engine']
+)
+ROWS_TOTAL = Counter(
+    'pdf_rows_extracted_total',
+    'Rows produced by each method',
+    ['method']
+)
+
+class ResultCache:
+    """Two-tier cache of extraction results keyed by upload content
+    
+    Results are stored as their JSON text, so a hit returns exactly what
+    the extraction returned. The memory tier is an LRU bounded by total
+    size. The optional disk tier keeps one file per result and evicts
+    the least recently used files once it grows past its size limit.
+    """
+    
+    def __init__(self, memory_bytes: int, disk_dir: str = '', disk_bytes: int = 0):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+        
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(content_hash: str, method: str, **params) -> str:
+        """Build a cache key from the upload's SHA-256, the method and its parameters"""
+        key = json.dumps([content_hash, method, params], sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    def get(self, key: str):
+        """Return a cached result or None"""
+        with self.lock:
+            text = self.entries.get(key)
+            if text is not None:
+                self.entries.move_to_end(key)
+                self.hits['memory'] += 1
+                return json.loads(text)
+        
+        if self.disk_dir:
+            path = os.path.join(self.disk_dir, f"{key}.json")
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                os.utime(path)
+            except OSError:
+                text = None
+            
+            if text is not None:
+                self._remember(key, text)
+                with self.lock:
+                    self.hits['disk'] += 1
+                return json.loads(text)
+        
+        with self.lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a result in both tiers
+        
+        Results marked engine_failed are not stored: a crashed or killed
+        engine may well work on the next try.
+        """
+        if result.get("engine_failed"):
+            return
+        text = json.dumps(result)
+        self._remember(key, text)
+        
+        if self.disk_dir:
+            path = os.path.join(self.disk_dir, f"{key}.json")
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+                self._evict_disk()
+            except OSError as e:
+                print(f"Result cache write failed: {e}")
+    
+    def _remember(self, key: str, text: str):
+        """Add a result to the memory tier, evicting the oldest entries"""
+        if len(text) > self.memory_bytes:
+            return
+        
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = text
+            self.size += len(text)
+            
+            while self.size > self.memory_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+    
+    def _evict_disk(self):
+        """Delete the least recently used files until the disk tier fits"""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self.lock:
+            hits = self.hits['memory'] + self.hits['disk']
+            lookups = hits + self.misses
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory": {
+                    "entries": len(self.entries),
+                    "bytes": self.size,
+                    "max_bytes": self.memory_bytes
+                },
+                "disk": {
+                    "enabled": bool(self.disk_dir),
+                    "max_bytes": self.disk_bytes
+                }
+            }
+
+
+result_cache = ResultCache(
+    RESULT_CACHE_MEMORY_MB * 1024 * 1024,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_DISK_MB * 1024 * 1024
+)
+
+
+class PageCache:
+    """LRU of parsed PDF pages keyed by upload content hash
+    
+    Each document maps page numbers to page snapshots (see page_snapshot),
+    pickled so their size is known and they go to a worker process as is.
+    Whole documents are evicted, least recently used first, once the total
+    size goes over max_bytes.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.documents = OrderedDict()
+        self.sizes = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, content_hash: str, pages: List[int]) -> Dict[int, bytes]:
+        """Return the cached snapshots of the given pages of a document"""
+        with self.lock:
+            document = self.documents.get(content_hash)
+            if document is not None:
+                self.documents.move_to_end(content_hash)
+            cached = {number: document[number] for number in pages if number in document} if document else {}
+            self.hits += len(cached)
+            self.misses += len(pages) - len(cached)
+            return cached
+    
+    def put(self, content_hash: str, snapshots: Dict[int, bytes]):
+        """Add page snapshots to a document, evicting the oldest documents"""
+        if not snapshots:
+            return
+        
+        with self.lock:
+            document = self.documents.setdefault(content_hash, {})
+            self.documents.move_to_end(content_hash)
+            for number, snapshot in snapshots.items():
+                old = document.get(number)
+                added = len(snapshot) - (len(old) if old is not None else 0)
+                document[number] = snapshot
+                self.sizes[content_hash] = self.sizes.get(content_hash, 0) + added
+                self.size += added
+            
+            while self.size > self.max_bytes and self.documents:
+                evicted, _ = self.documents.popitem(last=False)
+                self.size -= self.sizes.pop(evicted)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Page hit/miss counters and size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "documents": len(self.documents),
+                "pages": sum(len(document) for document in self.documents.values()),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes
+            }
+
+
+page_cache = PageCache(PAGE_CACHE_MEMORY_MB * 1024 * 1024)
+
+# Database connection pool
+db_pool = None
+db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Create the MySQL connection pool on first use"""
+    global db_pool
+    with db_pool_lock:
+        if db_pool is None:
+            db_pool = pooling.MySQLConnectionPool(
+                pool_name="crime_reports",
+                pool_size=MYSQL_POOL_SIZE,
+                pool_reset_session=True,
+                **MYSQL_CONFIG
+            )
+        return db_pool
+
+def get_db_connection():
+    """Check out a connection from the pool
+    
+    The pool pings each connection on checkout and reconnects stale ones.
+    Waits up to MYSQL_POOL_TIMEOUT seconds for a free connection and
+    returns None if MySQL is unreachable or the pool stays exhausted.
+    Calling close() on the connection hands it back to the pool.
+    """
+    try:
+        pool = get_db_pool()
+    except Error as e:
+        print(f"Error connecting to MySQL: {e}")
+        return None
+    
+    deadline = time.monotonic() + MYSQL_POOL_TIMEOUT
+    while True:
+        try:
+            return pool.get_connection()
+        except PoolError as e:
+            # Pool exhausted, wait for a connection to be returned
+            if time.monotonic() >= deadline:
+                print(f"Timed out waiting for a MySQL connection: {e}")
+                return None
+            time.sleep(0.05)
+        except Error as e:
+            print(f"Error connecting to MySQL: {e}")
+            return None
+
+@contextmanager
+def db_connection():
+    """Check out a pooled connection and always return it, even on errors"""
+    connection = get_db_connection()
+    try:
+        yield connection
+    finally:
+        if connection:
+            connection.close()
+
+def create_tables():
+    """Create necessary database tables if they don't exist"""
+    with db_connection() as connection:
+        if not connection:
+            return False
+        
+        try:
+            return create_schema(connection)
+        except Error as e:
+            print(f"Error creating tables: {e}")
+            return False
+
+def create_schema(connection):
+    """Create the tables on an open connection"""
+    cursor = connection.cursor()
+    
+    # Create extraction_logs table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS extraction_logs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            filename VARCHAR(255),
+            extraction_method VARCHAR(50),
+            rows_count INT,
+            columns_count INT,
+            column_names JSON,
+            layout VARCHAR(20) DEFAULT 'rows',
+            extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status VARCHAR(50)
+        )
+    """)
+    # Column order of row storage, which MySQL's JSON type does not keep;
+    # appends are checked against it
+    ensure_column(cursor, 'extraction_logs', 'column_names', 'JSON')
+    # "tables" when the rows are kept per table in extracted_tables
+    layout_added = ensure_column(cursor, 'extraction_logs', 'layout', "VARCHAR(20) DEFAULT 'rows'")
+    
+    # Create extracted_data table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS extracted_data (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            extraction_log_id INT,
+            row_data JSON,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (extraction_log_id) REFERENCES extraction_logs(id)
+        )
+    """)
+    
+    # Create extraction_blobs table, used when STORAGE_MODE=columnar
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS extraction_blobs (
+            extraction_log_id INT PRIMARY KEY,
+            format VARCHAR(20),
+            column_schema JSON,
+            data LONGBLOB,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (extraction_log_id) REFERENCES extraction_logs(id)
+        )
+    """)
+    
+    # Create extracted_tables table, one record per table of a layout=tables extraction
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS extracted_tables (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            extraction_log_id INT,
+            table_index INT,
+            page INT,
+            bbox JSON,
+            column_names JSON,
+            rows_count INT,
+            format VARCHAR(20),
+            column_schema JSON,
+            data LONGBLOB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE KEY uq_extracted_tables_log_index (extraction_log_id, table_index),
+            FOREIGN KEY (extraction_log_id) REFERENCES extraction_logs(id)
+        )
+    """)
+    
+    if layout_added:
+        cursor.execute("""
+            UPDATE extraction_logs SET layout = 'tables'
+            WHERE id IN (SELECT extraction_log_id FROM extracted_tables)
+        """)
+    
+    # Indexes behind the keyset pagination of /extractions and /extraction/{id}
+    ensure_index(cursor, 'extraction_logs', 'idx_extraction_logs_extracted_at', 'extracted_at, id')
+    ensure_index(cursor, 'extracted_data', 'idx_extracted_data_log_id', 'extraction_log_id, id')
+    
+    connection.commit()
+    cursor.close()
+    return True
+
+def ensure_column(cursor, table: str, name: str, definition: str) -> bool:
+    """Add a column to a table created by an older version of the schema, True if it was added"""
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, name))
+    if cursor.fetchone()[0]:
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    return True
+
+def ensure_index(cursor, table: str, name: str, columns: str):
+    """Create an index unless it exists (MySQL has no CREATE INDEX IF NOT EXISTS)"""
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, name))
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+def insert_extracted_rows(cursor, log_id: int, rows: List[Dict[str, Any]]) -> int:
+    """Insert rows into extracted_data in chunks of DB_INSERT_CHUNK_SIZE
+    
+    executemany() turns each chunk into one multi-row INSERT. Nothing is
+    committed here, so the caller keeps the whole extraction in one
+    transaction.
+    """
+    for start in range(0, len(rows), DB_INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + DB_INSERT_CHUNK_SIZE]
+        cursor.executemany("""
+            INSERT INTO extracted_data (extraction_log_id, row_data)
+            VALUES (%s, %s)
+        """, [(log_id, json.dumps(row)) for row in chunk])
+    return len(rows)
+
+def encode_columnar(rows: List[Dict[str, Any]]) -> Optional[Tuple[List[Dict[str, str]], bytes]]:
+    """Pack rows into one Parquet blob, returning (column_schema, blob)
+    
+    Returns None when the rows do not share one set of keys, so the caller
+    can keep them as JSON rows instead. Columns holding a single Python
+    type are stored natively; mixed columns (tabula numbers next to "" for
+    example) are stored as JSON text so they read back unchanged.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    if not rows:
+        return None
+    keys = list(rows[0].keys())
+    names = [str(key) for key in keys]
+    if len(set(names)) != len(names) or any(list(row.keys()) != keys for row in rows):
+        return None
+    
+    arrays = []
+    column_schema = []
+    for key, name in zip(keys, names):
+        values = [row[key] for row in rows]
+        kinds = {type(value) for value in values if value is not None}
+        array = None
+        if len(kinds) <= 1 and kinds <= {str, int, float, bool}:
+            try:
+                array = pa.array(values)
+            except (pa.ArrowInvalid, OverflowError):
+                array = None
+        if array is None:
+            array = pa.array([json.dumps(value) for value in values])
+            column_schema.append({'name': name, 'encoding': 'json'})
+        else:
+            column_schema.append({'name': name, 'encoding': 'plain'})
+        arrays.append(array)
+    
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_arrays(arrays, names=names), buffer, compression='zstd')
+    return column_schema, buffer.getvalue()
+
+def iter_columnar_batches(column_schema: Any, blob: bytes, batch_size: int,
+                          offset: int = 0, limit: Optional[int] = None):
+    """Yield the rows of a Parquet blob written by encode_columnar in batches
+    
+    offset/limit select a slice before any row is converted to Python
+    """
+    import pyarrow.parquet as pq
+    
+    if isinstance(column_schema, (str, bytes, bytearray)):
+        column_schema = json.loads(column_schema)
+    json_columns = [column['name'] for column in column_schema if column['encoding'] == 'json']
+    table = pq.read_table(io.BytesIO(blob)).slice(offset, limit)
+    for batch in table.to_batches(max_chunksize=batch_size):
+        rows = batch.to_pylist()
+        for row in rows:
+            for name in json_columns:
+                row[name] = json.loads(row[name])
+        yield rows
+
+def decode_columnar(column_schema: Any, blob: bytes, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Turn a Parquet blob written by encode_columnar back into rows"""
+    rows = []
+    for batch in iter_columnar_batches(column_schema, blob, 64 * 1024, offset, limit):
+        rows.extend(batch)
+    return rows
+
+def load_columnar_rows(connection, log_id: int, for_update: bool = False,
+                       offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+    """Rows of an extraction stored as a blob, None when it uses row storage"""
+    cursor = connection.cursor(buffered=True)
+    cursor.execute("""
+        SELECT column_schema, data FROM extraction_blobs
+        WHERE extraction_log_id = %s
+    """ + (" FOR UPDATE" if for_update else ""), (log_id,))
+    blob = cursor.fetchone()
+    cursor.close()
+    if not blob:
+        return None
+    return decode_columnar(blob[0], blob[1], offset, limit)
+
+class ExportSink(io.RawIOBase):
+    """Write-only file that hands written bytes back through drain()
+    
+    Lets ParquetWriter produce a Parquet file one row group at a time
+    without keeping the whole file in memory.
+    """
+    
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.position
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+def export_chunks(batches, format: str, columns: List[str]):
+    """Encode batches of row dicts as CSV, NDJSON or Parquet, one chunk per batch
+    
+    columns are the CSV and Parquet columns, the union of the keys of all
+    rows, so none is lost when it first shows up in a later batch. Parquet
+    stores every value as text, like CSV, because JSON rows do not promise
+    one type per column.
+    """
+    import csv
+    
+    writer = None
+    sink = None
+    for rows in batches:
+        if not rows:
+            continue
+        if format == 'ndjson':
+            yield ("\n".join(json.dumps(row) for row in rows) + "\n").encode()
+            continue
+        
+        if format == 'csv':
+            buffer = io.StringIO()
+            csv_writer = csv.DictWriter(buffer, fieldnames=columns, restval="", extrasaction='ignore')
+            if writer is None:
+                csv_writer.writeheader()
+                writer = csv_writer
+            csv_writer.writerows(rows)
+            yield buffer.getvalue().encode()
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            
+            schema = pa.schema([(str(column), pa.string()) for column in columns])
+            if writer is None:
+                sink = ExportSink()
+                writer = pq.ParquetWriter(sink, schema, compression='zstd')
+            writer.write_table(pa.Table.from_pylist([
+                {
+                    str(column): None if row.get(column) is None
+                    else row[column] if isinstance(row[column], str)
+                    else json.dumps(row[column])
+                    for column in columns
+                }
+                for row in rows
+            ], schema=schema))
+            yield sink.drain()
+    
+    if format == 'parquet' and writer is not None:
+        writer.close()
+        yield sink.drain()
+
+def stream_export(log_id: int, format: str, column_names: Any = None):
+    """Stream a saved extraction, checking out a pooled connection for it
+    
+    The connection is only checked out once the first chunk is asked for
+    and is returned when the stream ends or is abandoned. Row storage is
+    read through an unbuffered cursor EXPORT_FETCH_SIZE rows at a time, so
+    memory stays flat however large the extraction is. CSV and Parquet
+    columns come from the log's column_names, in the order they were
+    saved; logs from before it was stored fall back to the union of the
+    keys of every row (JSON_KEYS). A Parquet blob is sent as stored when
+    Parquet is asked for.
+    """
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    
+    cursor = None
+    try:
+        blob_cursor = connection.cursor(buffered=True)
+        blob_cursor.execute("""
+            SELECT column_schema, data FROM extraction_blobs
+            WHERE extraction_log_id = %s
+        """, (log_id,))
+        blob = blob_cursor.fetchone()
+        blob_cursor.close()
+        
+        if blob and format == 'parquet':
+            data = bytes(blob[1])
+            for start in range(0, len(data), UPLOAD_CHUNK_SIZE):
+                yield data[start:start + UPLOAD_CHUNK_SIZE]
+            return
+        if blob:
+            column_schema = json.loads(blob[0]) if isinstance(blob[0], (str, bytes, bytearray)) else blob[0]
+            columns = [column['name'] for column in column_schema]
+            yield from export_chunks(iter_columnar_batches(blob[0], blob[1], EXPORT_FETCH_SIZE), format, columns)
+            return
+        
+        columns = []
+        if format != 'ndjson' and column_names:
+            # Row keys are strings once stored as JSON
+            saved = json.loads(column_names) if isinstance(column_names, (str, bytes, bytearray)) else column_names
+            columns = [str(column) for column in saved]
+        elif format != 'ndjson':
+            # JSON rows need not share keys and MySQL sorts them: collect
+            # the union of the keys first, so CSV and Parquet get every column
+            cursor = connection.cursor(buffered=False)
+            cursor.execute("""
+                SELECT JSON_KEYS(row_data) FROM extracted_data
+                WHERE extraction_log_id = %s
+                ORDER BY id
+            """, (log_id,))
+            seen = {}
+            while True:
+                fetched = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not fetched:
+                    break
+                for (keys,) in fetched:
+                    seen.update(dict.fromkeys(json.loads(keys) if keys else []))
+            cursor.close()
+            cursor = None
+            columns = list(seen)
+        
+        cursor = connection.cursor(buffered=False)
+        cursor.execute("""
+            SELECT row_data FROM extracted_data
+            WHERE extraction_log_id = %s
+            ORDER BY id
+        """, (log_id,))
+        
+        def batches():
+            while True:
+                fetched = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not fetched:
+                    break
+                yield [json.loads(row[0]) for row in fetched]
+        
+        yield from export_chunks(batches(), format, columns)
+    finally:
+        try:
+            # An abandoned download leaves rows unread on the connection
+            if connection.unread_result:
+                connection.consume_results()
+            if cursor:
+                cursor.close()
+        except Error as e:
+            print(f"Error closing export cursor: {e}")
+        connection.close()
+
+def store_extracted_rows(cursor, log_id: int, rows: List[Dict[str, Any]]) -> str:
+    """Store the rows of a new extraction in the configured STORAGE_MODE
+    
+    Falls back to row storage when the rows cannot share one column schema.
+    Returns the storage actually used.
+    """
+    packed = encode_columnar(rows) if STORAGE_MODE == 'columnar' else None
+    if not packed:
+        insert_extracted_rows(cursor, log_id, rows)
+        return 'rows'
+    
+    column_schema, blob = packed
+    cursor.execute("""
+        INSERT INTO extraction_blobs (extraction_log_id, format, column_schema, data)
+        VALUES (%s, %s, %s, %s)
+    """, (log_id, 'parquet', json.dumps(column_schema), blob))
+    return 'columnar'
+
+def save_extraction(filename: str, method: str, columns: List[str], rows: List[Dict[str, Any]]) -> int:
+    """Save an extraction log and its rows in one transaction, returning the log id"""
+    with db_connection() as connection:
+        if not connection:
+            raise HTTPException(
+                status_code=500,
+                detail="Database connection failed. Please check MySQL configuration."
+            )
+        
+        try:
+            cursor = connection.cursor()
+            
+            # Insert into extraction_logs
+            cursor.execute("""
+                INSERT INTO extraction_logs 
+                (filename, extraction_method, rows_count, columns_count, column_names, status)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (filename, method, len(rows), len(columns), json.dumps(columns), 'success'))
+            
+            log_id = cursor.lastrowid
+            
+            # Store the rows, committed together with the log
+            with STAGE_SECONDS.labels('db_insert').time():
+                store_extracted_rows(cursor, log_id, rows)
+                connection.commit()
+            cursor.close()
+            return log_id
+            
+        except Error as e:
+            connection.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error: {str(e)}"
+            )
+
+def encode_table_rows(rows: List[Dict[str, Any]]) -> Tuple[str, Optional[List[Dict[str, str]]], bytes]:
+    """Pack one table's rows for extracted_tables as (format, column_schema, data)
+    
+    Parquet when STORAGE_MODE=columnar and the rows share one schema, a JSON
+    array otherwise.
+    """
+    packed = encode_columnar(rows) if STORAGE_MODE == 'columnar' else None
+    if packed:
+        return 'parquet', packed[0], packed[1]
+    return 'json', None, json.dumps(rows).encode()
+
+def decode_table_rows(format: str, column_schema: Any, data: bytes,
+                      offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Unpack a slice of one extracted_tables record's rows"""
+    if format == 'parquet':
+        return decode_columnar(column_schema, data, offset, limit)
+    rows = json.loads(data)
+    return rows[offset:offset + limit if limit is not None else None]
+
+def save_extraction_tables(filename: str, method: str, tables: List[Dict[str, Any]]) -> int:
+    """Save a layout=tables extraction, one extracted_tables record per table, returning the log id"""
+    with db_connection() as connection:
+        if not connection:
+            raise HTTPException(
+                status_code=500,
+                detail="Database connection failed. Please check MySQL configuration."
+            )
+        
+        try:
+            cursor = connection.cursor()
+            
+            # column_names holds every table's columns in first-seen order;
+            # each table keeps its own in extracted_tables
+            columns = {}
+            for table in tables:
+                columns.update(dict.fromkeys(table["columns"]))
+            cursor.execute("""
+                INSERT INTO extraction_logs 
+                (filename, extraction_method, rows_count, columns_count, column_names, layout, status)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                filename,
+                method,
+                sum(table["rows"] for table in tables),
+                max((len(table["columns"]) for table in tables), default=0),
+                json.dumps(list(columns)),
+                'tables',
+                'success'
+            ))
+            log_id = cursor.lastrowid
+            
+            with STAGE_SECONDS.labels('db_insert').time():
+                for table in tables:
+                    format, column_schema, data = encode_table_rows(table["data"])
+                    cursor.execute("""
+                        INSERT INTO extracted_tables
+                        (extraction_log_id, table_index, page, bbox, column_names, rows_count,
+                         format, column_schema, data)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """, (
+                        log_id,
+                        table["index"],
+                        table["page"],
+                        json.dumps(table["bbox"]),
+                        json.dumps(table["columns"]),
+                        table["rows"],
+                        format,
+                        json.dumps(column_schema) if column_schema is not None else None,
+                        data
+                    ))
+                connection.commit()
+            cursor.close()
+            return log_id
+            
+        except Error as e:
+            connection.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error: {str(e)}"
+            )
+
+def persisted_tables_summary(result: Dict[str, Any], log_id: int) -> Dict[str, Any]:
+    """The persist=true answer for a layout=tables result: every table without its rows"""
+    return {
+        "status": "success",
+        "method": result["method"],
+        "layout": "tables",
+        "rows": result["rows"],
+        "tables": [
+            {key: value for key, value in table.items() if key != "data"}
+            for table in result["tables"]
+        ],
+        "extraction_id": log_id,
+        "appended": False
+    }
+
+def align_appended_rows(stored: List[str], columns: List[Any], rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fit rows appended to an extraction to its stored columns, 409 when they do not fit
+    
+    An append usually starts mid-document (since_page), on a page without
+    a header row, so the engine took the page's first data row as the
+    header. When none of the columns matches the stored one at its
+    position but their number does, that row goes back in as data and
+    every row is keyed by the stored columns.
+    """
+    incoming = json.loads(json.dumps(columns))
+    if incoming == stored:
+        return rows
+    
+    headerless = len(incoming) == len(stored) and all(
+        new != old for new, old in zip(incoming, stored)
+    )
+    if headerless and all(len(row) == len(stored) for row in rows):
+        header_row = ["" if column is None else column for column in columns]
+        return [dict(zip(stored, header_row))] + [dict(zip(stored, row.values())) for row in rows]
+    
+    raise HTTPException(
+        status_code=409,
+        detail=f"Columns {incoming} do not match the columns {stored} of the extraction."
+    )
+
+def stored_columns(cursor, log_id: int, column_names: Any) -> Tuple[Optional[List[str]], bool]:
+    """Columns of a saved extraction and whether their order is known
+    
+    Logs written before column_names was added fall back to the blob's
+    schema, or to the keys of a stored row, which MySQL's JSON type keeps
+    in an order of its own. None when there is nothing to compare with.
+    """
+    if column_names:
+        return json.loads(column_names) if isinstance(column_names, (str, bytes, bytearray)) else column_names, True
+    
+    cursor.execute("""
+        SELECT column_schema FROM extraction_blobs WHERE extraction_log_id = %s
+    """, (log_id,))
+    blob = cursor.fetchone()
+    if blob:
+        column_schema = json.loads(blob[0]) if isinstance(blob[0], (str, bytes, bytearray)) else blob[0]
+        return [column['name'] for column in column_schema], True
+    
+    cursor.execute("""
+        SELECT row_data FROM extracted_data WHERE extraction_log_id = %s ORDER BY id LIMIT 1
+    """, (log_id,))
+    row = cursor.fetchone()
+    return (list(json.loads(row[0])) if row else None), False
+
+def append_to_extraction(log_id: int, columns: List[str], rows: List[Dict[str, Any]]) -> int:
+    """Append rows to an existing extraction in one transaction
+    
+    The rows must fit the extraction's columns (see align_appended_rows),
+    otherwise nothing is written and the answer is 409. So is appending
+    to a layout=tables extraction, whose rows live in extracted_tables.
+    """
+    with db_connection() as connection:
+        if not connection:
+            raise HTTPException(
+                status_code=500,
+                detail="Database connection failed. Please check MySQL configuration."
+            )
+        
+        try:
+            cursor = connection.cursor(buffered=True)
+            
+            # Lock the log row so concurrent appends keep rows_count right
+            cursor.execute("""
+                SELECT column_names, layout FROM extraction_logs WHERE id = %s FOR UPDATE
+            """, (log_id,))
+            log = cursor.fetchone()
+            if not log:
+                connection.rollback()
+                raise HTTPException(status_code=404, detail="Extraction not found")
+            if log[1] == 'tables':
+                connection.rollback()
+                raise HTTPException(
+                    status_code=409,
+                    detail="Rows cannot be appended to a layout=tables extraction."
+                )
+            if not rows:
+                connection.rollback()
+                cursor.close()
+                return log_id
+            
+            stored, ordered = stored_columns(cursor, log_id, log[0])
+            if stored is not None and not ordered:
+                # Only the set of columns can be compared
+                if sorted(json.loads(json.dumps(columns))) != sorted(stored):
+                    connection.rollback()
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Columns {columns} do not match the columns {stored} of the extraction."
+                    )
+            elif stored is not None:
+                try:
+                    rows = align_appended_rows(stored, columns, rows)
+                except HTTPException:
+                    connection.rollback()
+                    raise
+            
+            with STAGE_SECONDS.labels('db_insert').time():
+                # Blobs are rewritten whole; rows that no longer fit the blob's
+                # schema move the extraction over to row storage
+                existing = load_columnar_rows(connection, log_id, for_update=True)
+                if existing is None:
+                    insert_extracted_rows(cursor, log_id, rows)
+                else:
+                    packed = encode_columnar(existing + rows)
+                    if packed:
+                        column_schema, blob = packed
+                        cursor.execute("""
+                            UPDATE extraction_blobs SET column_schema = %s, data = %s
+                            WHERE extraction_log_id = %s
+                        """, (json.dumps(column_schema), blob, log_id))
+                    else:
+                        cursor.execute("""
+                            DELETE FROM extraction_blobs WHERE extraction_log_id = %s
+                        """, (log_id,))
+                        insert_extracted_rows(cursor, log_id, existing + rows)
+                
+                cursor.execute("""
+                    UPDATE extraction_logs
+                    SET rows_count = rows_count + %s,
+                        columns_count = GREATEST(columns_count, %s)
+                    WHERE id = %s
+                """, (len(rows), len(columns), log_id))
+                
+                connection.commit()
+            cursor.close()
+            return log_id
+            
+        except Error as e:
+            connection.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Database error: {str(e)}"
+            )
+
+def append_no_pages(log_id: int) -> Dict[str, Any]:
+    """The answer of an append whose since_page is past the last page: nothing is appended"""
+    append_to_extraction(log_id, [], [])
+    return {
+        "status": "success",
+        "method": None,
+        "rows": 0,
+        "columns": [],
+        "extraction_id": log_id,
+        "appended": True,
+        "message": "No new pages to extract"
+    }
+
+async def prepare_database():
+    """Create the MySQL schema in the background, retrying until MySQL answers"""
+    delay = 1
+    while not await asyncio.to_thread(create_tables):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60)
+    readiness['database'] = True
+
+
+class ExtractionLimitError(HTTPException):
+    """An extraction went over its time, memory or page limit"""
+
+
+def read_pdf_with_java(pdf_path: str, options: Dict[str, Any]) -> List[pd.DataFrame]:
+    """Extract tables with tabula launching java, for killable worker processes"""
+    import tabula
+    
+    kwargs = dict(TABULA_OPTIONS)
+    kwargs.update(options)
+    return tabula.read_pdf(pdf_path, force_subprocess=True, **kwargs)
+
+
+def read_pdf_with_tabula(pdf_path: str, **options) -> List[pd.DataFrame]:
+    """Extract tables with tabula through the long-lived engine"""
+    import tabula
+    
+    kwargs = dict(TABULA_OPTIONS)
+    kwargs.update(options)
+    return tabula.read_pdf(
+        pdf_path,
+        force_subprocess=tabula_engine['mode'] == 'subprocess',
+        **kwargs
+    )
+
+
+def page_snapshot(page) -> bytes:
+    """Pickle the objects of a parsed pdfplumber page that table finding needs"""
+    objects = {
+        kind: [{attr: obj[attr] for attr in SNAPSHOT_ATTRS if attr in obj} for obj in page.objects.get(kind, [])]
+        for kind in SNAPSHOT_OBJECT_TYPES
+    }
+    return pickle.dumps({
+        "page_number": page.page_number,
+        "rotation": page.rotation,
+        "initial_doctop": page.initial_doctop,
+        "mediabox": page.mediabox,
+        "bbox": page.bbox,
+        "objects": objects
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def page_from_snapshot(snapshot: bytes):
+    """Rebuild a pdfplumber page from page_snapshot output, without the PDF
+    
+    Page.__init__ needs the parsed document, so the page is filled in by
+    hand; with its objects already set pdfplumber never parses it.
+    """
+    from functools import lru_cache
+    from pdfplumber.page import Page
+    
+    state = pickle.loads(snapshot)
+    page = Page.__new__(Page)
+    page.pdf = None
+    page.page_obj = None
+    page.root_page = page
+    page.cropbox = None
+    for name in ("page_number", "rotation", "initial_doctop", "mediabox", "bbox"):
+        setattr(page, name, state[name])
+    page._objects = state["objects"]
+    page.get_textmap = lru_cache()(page._get_textmap)
+    return page
+
+
+def iter_pdf_pages(pdf_path: str, pages: List[int] = None, cached_pages: Dict[int, bytes] = None,
+                   parsed_pages: Dict[int, bytes] = None):
+    """Yield pdfplumber pages in page order, rebuilding cached ones from their snapshots
+    
+    Only pages missing from cached_pages are parsed. When parsed_pages is
+    a dict, the snapshot of every page parsed here is added to it.
+    
+    pages limits extraction to the given 1-based page numbers
+    """
+    import pdfplumber
+    from contextlib import nullcontext
+    
+    cached_pages = cached_pages or {}
+    missing = None if pages is None else [number for number in pages if number not in cached_pages]
+    with (pdfplumber.open(pdf_path, pages=missing) if missing != [] else nullcontext()) as pdf:
+        opened = {page.page_number: page for page in pdf.pages} if pdf else {}
+        for number in pages if pages is not None else list(opened):
+            if number in cached_pages:
+                yield page_from_snapshot(cached_pages[number])
+            elif number in opened:
+                yield opened[number]
+                if parsed_pages is not None:
+                    parsed_pages[number] = page_snapshot(opened[number])
+
+
+def edge_array(edges: List[Dict[str, Any]]):
+    """Pack pdfplumber edge dicts into an EDGE_FIELDS structured array"""
+    import numpy as np
+    
+    return np.array([
+        (e["x0"], e["x1"], e["top"], e["bottom"], e.get("width", 0), e.get("height", 0), e["orientation"] or "")
+        for e in edges
+    ], dtype=EDGE_FIELDS)
+
+
+def page_edge_array(page, strict: bool = False):
+    """Edges of a page's lines, rects and curves as an EDGE_FIELDS array, in page.edges order
+    
+    Rects give their top, bottom, left and right side and curves one edge
+    per segment, like pdfplumber's rect_to_edges and curve_to_edges.
+    strict keeps only the lines (the "lines_strict" strategy).
+    """
+    import numpy as np
+    
+    lines = np.array([
+        (line["x0"], line["x1"], line["top"], line["bottom"], line["width"], line["height"],
+         "h" if line["top"] == line["bottom"] else "v")
+        for line in page.lines
+    ], dtype=EDGE_FIELDS)
+    if strict:
+        return lines
+    
+    rects = np.array([
+        (rect["x0"], rect["x1"], rect["top"], rect["bottom"], rect["width"], rect["height"])
+        for rect in page.rects
+    ], dtype=float).reshape(-1, 6)
+    x0, x1, top, bottom, width, height = rects.T
+    zero = np.zeros(len(rects))
+    rect_edges = np.empty((len(rects), 4), dtype=EDGE_FIELDS)
+    for field, sides in (("x0", (x0, x0, x0, x1)), ("x1", (x1, x1, x0, x1)),
+                         ("top", (top, top + height, top, top)), ("bottom", (top, bottom, bottom, bottom)),
+                         ("width", (width, width, zero, zero)), ("height", (zero, zero, height, height))):
+        rect_edges[field] = np.stack(sides, axis=1)
+    rect_edges["orientation"] = ("h", "h", "v", "v")
+    
+    segments = np.array([
+        (*start, *end)
+        for curve in page.curves
+        for start, end in zip(curve["pts"], curve["pts"][1:])
+    ], dtype=float).reshape(-1, 4)
+    start_x, start_y, end_x, end_y = segments.T
+    curve_edges = np.empty(len(segments), dtype=EDGE_FIELDS)
+    curve_edges["x0"] = np.minimum(start_x, end_x)
+    curve_edges["x1"] = np.maximum(start_x, end_x)
+    curve_edges["top"] = np.minimum(start_y, end_y)
+    curve_edges["bottom"] = np.maximum(start_y, end_y)
+    curve_edges["width"] = np.abs(start_x - end_x)
+    curve_edges["height"] = np.abs(start_y - end_y)
+    curve_edges["orientation"] = np.where(start_x == end_x, "v", np.where(start_y == end_y, "h", ""))
+    
+    return np.concatenate([lines, rect_edges.ravel(), curve_edges])
+
+
+def snap_edge_array(edges, attr: str, tolerance: float):
+    """pdfplumber's snap_objects on an edge array
+    
+    attr values chaining within tolerance form a cluster and move to its
+    average; the edges come back grouped by cluster, like pdfplumber's.
+    """
+    import numpy as np
+    
+    if not len(edges):
+        return edges
+    distinct = np.unique(edges[attr])
+    starts_cluster = np.ones(len(distinct), dtype=bool)
+    if tolerance > 0:
+        starts_cluster[1:] = distinct[1:] > distinct[:-1] + tolerance
+    cluster = (np.cumsum(starts_cluster) - 1)[np.searchsorted(distinct, edges[attr])]
+    order = np.argsort(cluster, kind="stable")
+    edges = edges[order]
+    cluster = cluster[order]
+    values = edges[attr]
+    
+    starts = np.flatnonzero(np.diff(cluster, prepend=-1))
+    counts = np.diff(np.append(starts, len(edges)))
+    sums = values[starts]
+    # Python's sum, so the averages come out bit for bit like pdfplumber's
+    for index in np.flatnonzero(counts > 1):
+        sums[index] = sum(values[starts[index]:starts[index] + counts[index]].tolist())
+    move = (sums / counts)[cluster] - values
+    other = "x1" if attr == "x0" else "bottom"
+    edges[other] = edges[other] + move
+    edges[attr] = values + move
+    return edges
+
+
+def join_edge_array(edges, orientation: str, tolerance: float):
+    """pdfplumber's join_edge_group on every line of an edge array at once
+    
+    Edges on one line (same top for "h", same x0 for "v") that overlap or
+    are within tolerance of each other become one edge spanning them.
+    """
+    import numpy as np
+    
+    if orientation == "h":
+        key, start, end, size = "top", "x0", "x1", "width"
+    else:
+        key, start, end, size = "x0", "top", "bottom", "height"
+    if not len(edges):
+        return edges
+    
+    count = len(edges)
+    edges = edges[np.lexsort((np.arange(count), edges[start], edges[key]))]
+    first = np.ones(count, dtype=bool)
+    first[1:] = edges[key][1:] != edges[key][:-1]
+    line = np.cumsum(first)
+    
+    # Running maximum of end within each line: ranked by (line, end), the
+    # rank only grows from one line to the next, so its running maximum
+    # restarts at every line
+    by_end = np.lexsort((edges[end], line))
+    rank = np.empty(count, dtype=np.intp)
+    rank[by_end] = np.arange(count)
+    reach = edges[end][by_end[np.maximum.accumulate(rank)]]
+    
+    separate = first.copy()
+    separate[1:] |= edges[start][1:] > reach[:-1] + tolerance
+    heads = np.flatnonzero(separate)
+    joined = edges[heads]
+    grown = reach[np.append(heads[1:], count) - 1]
+    extend = grown > joined[end]
+    if orientation == "h":
+        joined[size] = np.where(extend, grown - joined[start], joined[size])
+    else:
+        joined[size] = np.where(extend, joined[size] + (grown - joined[end]), joined[size])
+    joined[end] = np.where(extend, grown, joined[end])
+    return joined
+
+
+def table_cells(v, h, x_tolerance: float, y_tolerance: float):
+    """pdfplumber's edges_to_intersections and intersections_to_cells on edge arrays
+    
+    Returns the cells as rows of (x0, top, x1, bottom) indexes into the
+    sorted distinct intersection xs and tops, with those xs and tops. None
+    when the intersection grid is larger than DETECTOR_MAX_GRID.
+    """
+    import numpy as np
+    
+    touches = (
+        (v["top"][:, None] <= h["top"] + y_tolerance)
+        & (v["bottom"][:, None] >= h["top"] - y_tolerance)
+        & (v["x0"][:, None] >= h["x0"] - x_tolerance)
+        & (v["x0"][:, None] <= h["x1"] + x_tolerance)
+    )
+    v_used = touches.any(axis=1)
+    h_used = touches.any(axis=0)
+    v, h = v[v_used], h[h_used]
+    v_index, h_index = np.nonzero(touches[v_used][:, h_used])
+    if not len(v_index):
+        return np.empty((0, 4), dtype=np.intp), np.empty(0), np.empty(0)
+    xs, point_col = np.unique(v["x0"][v_index], return_inverse=True)
+    ys, point_row = np.unique(h["top"][h_index], return_inverse=True)
+    nx, ny = len(xs), len(ys)
+    if nx * ny * max(nx, ny, len(v), len(h)) > DETECTOR_MAX_GRID:
+        return None
+    
+    # down[c, a, b]: one vertical edge in column c runs through rows a and b,
+    # across[r, a, b]: one horizontal edge in row r through columns a and b
+    v_rows = np.zeros((len(v), ny), dtype=np.float32)
+    v_rows[v_index, point_row] = 1
+    v_col = np.zeros((len(v), nx), dtype=np.float32)
+    v_col[np.arange(len(v)), np.searchsorted(xs, v["x0"])] = 1
+    down = ((v_col.T[:, None, :] * v_rows.T).reshape(nx * ny, len(v)) @ v_rows).reshape(nx, ny, ny) > 0
+    h_cols = np.zeros((len(h), nx), dtype=np.float32)
+    h_cols[h_index, point_col] = 1
+    h_row = np.zeros((len(h), ny), dtype=np.float32)
+    h_row[np.arange(len(h)), np.searchsorted(ys, h["top"])] = 1
+    across = ((h_row.T[:, None, :] * h_cols.T).reshape(ny * nx, len(h)) @ h_cols).reshape(ny, nx, nx) > 0
+    
+    # Intersections in pdfplumber's order (by x, then top). The cell of a
+    # point is the nearest bottom row, then the nearest right column, whose
+    # four sides are each covered by one edge
+    point_x, point_y = np.divmod(np.unique(point_col * ny + point_row), ny)
+    cells = []
+    batch = max(1, 4_000_000 // (nx * ny))
+    for first in range(0, len(point_x), batch):
+        x = point_x[first:first + batch]
+        y = point_y[first:first + batch]
+        below = down[x, y] & (np.arange(ny) > y[:, None])
+        right = across[y, x] & (np.arange(nx) > x[:, None])
+        corner = (
+            below[:, :, None] & right[:, None, :]
+            & down[:, y].transpose(1, 2, 0)
+            & across[:, x].transpose(1, 0, 2)
+        )
+        closed = corner.any(axis=2)
+        found = closed.any(axis=1)
+        bottom = closed.argmax(axis=1)
+        right_x = corner[np.arange(len(x)), bottom].argmax(axis=1)
+        cells.append(np.stack([x, y, right_x, bottom], axis=1)[found])
+    return np.concatenate(cells), xs, ys
+
+
+def cell_tables(cells, nx: int) -> List[Any]:
+    """pdfplumber's cells_to_tables: cells sharing corners, transitively, form a table
+    
+    cells are table_cells grid indexes and nx the number of grid columns.
+    Returns the cell indexes of every table with more than one cell, top
+    to bottom then left to right.
+    """
+    import numpy as np
+    
+    if not len(cells):
+        return []
+    x0, top, x1, bottom = cells.T
+    corners = np.stack([top * nx + x0, bottom * nx + x0, top * nx + x1, bottom * nx + x1], axis=1)
+    labels = np.arange(len(cells))
+    while True:
+        lowest = np.full(corners.max() + 1, len(cells))
+        np.minimum.at(lowest, corners.ravel(), np.repeat(labels, 4))
+        merged = lowest[corners].min(axis=1)
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+    
+    order = np.argsort(labels, kind="stable")
+    starts = np.flatnonzero(np.diff(labels[order], prepend=-1))
+    tables = np.split(order, starts[1:])
+    top_left = np.minimum.reduceat((top * nx + x0)[order], starts)
+    return [tables[index] for index in np.argsort(top_left) if len(tables[index]) > 1]
+
+
+def detect_tables(page, table_settings: Dict[str, Any] = None) -> Optional[List[Tuple[Tuple[float, ...], List[List[Optional[str]]]]]]:
+    """Find a page's tables with NumPy arrays instead of pdfplumber's TableFinder
+    
+    Returns (bbox, rows) per table, the same as find_tables() and extract()
+    give. Edge snapping and joining, intersections, cells and assigning
+    chars to cells run on arrays; cell text still comes from pdfplumber's
+    extract_text. None for what it does not cover (explicit lines, grids
+    beyond DETECTOR_MAX_GRID), to be left to pdfplumber.
+    """
+    import numpy as np
+    from pdfplumber.table import TableSettings, words_to_edges_h, words_to_edges_v
+    from pdfplumber.utils import extract_text
+    
+    settings = TableSettings.resolve(table_settings)
+    strategies = (settings.vertical_strategy, settings.horizontal_strategy)
+    if "explicit" in strategies or settings.explicit_vertical_lines or settings.explicit_horizontal_lines:
+        return None
+    if "text" in strategies:
+        words = page.extract_words(**settings.text_settings)
+    page_edges = {}
+    
+    def base_edges(strategy, orientation):
+        if strategy == "text" and orientation == "v":
+            return edge_array(words_to_edges_v(words, word_threshold=settings.min_words_vertical))
+        if strategy == "text":
+            return edge_array(words_to_edges_h(words, word_threshold=settings.min_words_horizontal))
+        if strategy not in page_edges:
+            page_edges[strategy] = page_edge_array(page, strict=strategy == "lines_strict")
+        edges = page_edges[strategy]
+        size = "height" if orientation == "v" else "width"
+        return edges[(edges["orientation"] == orientation) & (edges[size] >= 1)]
+    
+    v = base_edges(settings.vertical_strategy, "v")
+    h = base_edges(settings.horizontal_strategy, "h")
+    if settings.snap_x_tolerance > 0 or settings.snap_y_tolerance > 0:
+        v = snap_edge_array(v, "x0", settings.snap_x_tolerance)
+        h = snap_edge_array(h, "top", settings.snap_y_tolerance)
+    v = join_edge_array(v, "v", settings.join_y_tolerance)
+    h = join_edge_array(h, "h", settings.join_x_tolerance)
+    v = v[v["height"] >= settings.edge_min_length]
+    h = h[h["width"] >= settings.edge_min_length]
+    if not len(v) or not len(h):
+        return []
+    
+    grid = table_cells(v, h, settings.intersection_x_tolerance, settings.intersection_y_tolerance)
+    if grid is None:
+        return None
+    cells, xs, ys = grid
+    tables = cell_tables(cells, len(xs))
+    if not tables:
+        return []
+    
+    chars = page.chars
+    bounds = np.array([(char["x0"], char["x1"], char["top"], char["bottom"]) for char in chars], dtype=float).reshape(-1, 4)
+    h_mid = (bounds[:, 0] + bounds[:, 1]) / 2
+    v_mid = (bounds[:, 2] + bounds[:, 3]) / 2
+    
+    found = []
+    for members in tables:
+        x0, top, x1, bottom = xs[cells[members, 0]], ys[cells[members, 1]], xs[cells[members, 2]], ys[cells[members, 3]]
+        bbox = (float(x0.min()), float(top.min()), float(x1.max()), float(bottom.max()))
+        _, row = np.unique(cells[members, 1], return_inverse=True)
+        columns, col = np.unique(cells[members, 0], return_inverse=True)
+        
+        # Chars whose midpoint lies in a cell, in page order within each cell
+        nearby = np.flatnonzero((h_mid >= bbox[0]) & (h_mid < bbox[2]) & (v_mid >= bbox[1]) & (v_mid < bbox[3]))
+        inside = (
+            (h_mid[nearby, None] >= x0) & (h_mid[nearby, None] < x1)
+            & (v_mid[nearby, None] >= top) & (v_mid[nearby, None] < bottom)
+        )
+        char_index, cell_index = np.nonzero(inside)
+        by_cell = nearby[char_index[np.argsort(cell_index, kind="stable")]]
+        cell_chars = np.split(by_cell, np.cumsum(np.bincount(cell_index, minlength=len(members)))[:-1])
+        
+        rows = [[None] * len(columns) for _ in range(row.max() + 1)]
+        for index, char_indexes in enumerate(cell_chars):
+            text = ""
+            if len(char_indexes):
+                kwargs = dict(settings.text_settings, x_shift=float(x0[index]), y_shift=float(top[index]))
+                if "layout" in kwargs:
+                    kwargs["layout_width"] = float(x1[index] - x0[index])
+                    kwargs["layout_height"] = float(bottom[index] - top[index])
+                text = extract_text([chars[i] for i in char_indexes], **kwargs)
+            rows[row[index]][col[index]] = text
+        found.append((bbox, rows))
+    return found
+
+
+def page_tables(page, table_settings: Dict[str, Any] = None) -> List[Tuple[Tuple[float, ...], List[List[Optional[str]]]]]:
+    """Find a page's tables as (bbox, rows) with the PDFPLUMBER_TABLE_DETECTOR
+    
+    bbox is (x0, top, x1, bottom); rows are what pdfplumber's extract() gives.
+    """
+    from pdfplumber.table import TableSettings
+    
+    if PDFPLUMBER_TABLE_DETECTOR == "numpy":
+        tables = detect_tables(page, table_settings)
+        if tables is not None:
+            return tables
+    settings = TableSettings.resolve(table_settings)
+    return [(table.bbox, table.extract(**settings.text_settings)) for table in page.find_tables(settings)]
+
+
+def extract_rows_with_pdfplumber(pdf_path: str, pages: List[int] = None,
+                                 table_settings: Dict[str, Any] = None,
+                                 cached_pages: Dict[int, bytes] = None,
+                                 parsed_pages: Dict[int, bytes] = None) -> List[List[Any]]:
+    """Collect the rows of every table pdfplumber finds, in page order
+    
+    pages limits extraction to the given 1-based page numbers.
+    cached_pages and parsed_pages are passed to iter_pdf_pages.
+    """
+    all_tables = []
+    for page in iter_pdf_pages(pdf_path, pages, cached_pages, parsed_pages):
+        for _, rows in page_tables(page, table_settings):
+            all_tables.extend(rows)
+    return all_tables
+
+
+def extract_tables_with_pdfplumber(pdf_path: str, pages: List[int] = None,
+                                   table_settings: Dict[str, Any] = None,
+                                   cached_pages: Dict[int, bytes] = None,
+                                   parsed_pages: Dict[int, bytes] = None) -> List[Dict[str, Any]]:
+    """Collect every table pdfplumber finds as {"page", "bbox", "rows"}, in page order
+    
+    bbox is (x0, top, x1, bottom) in PDF points from the page's top-left corner.
+    pages limits extraction to the given 1-based page numbers.
+    cached_pages and parsed_pages are passed to iter_pdf_pages.
+    """
+    all_tables = []
+    for page in iter_pdf_pages(pdf_path, pages, cached_pages, parsed_pages):
+        for bbox, rows in page_tables(page, table_settings):
+            if rows:
+                all_tables.append({
+                    "page": page.page_number,
+                    "bbox": [round(value, 2) for value in bbox],
+                    "rows": rows
+                })
+    return all_tables
+
+
+def tabula_json_tables(raw_tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Turn tabula's JSON output into {"page", "bbox", "rows"} tables like pdfplumber's"""
+    tables = []
+    for table in raw_tables:
+        rows = [[cell.get("text") or None for cell in row] for row in table.get("data", [])]
+        if rows:
+            tables.append({
+                "page": table.get("page_number"),
+                "bbox": [round(table[edge], 2) for edge in ("left", "top", "right", "bottom")],
+                "rows": rows
+            })
+    return tables
+
+
+def scan_pdf_layout(pdf_path: str, pages: List[int] = None, cached_pages: Dict[int, bytes] = None,
+                    parsed_pages: Dict[int, bytes] = None) -> Dict[str, Any]:
+    """Count ruled and text pages on a few evenly spread sample pages
+    
+    Only reads each sampled page's objects, no table finding, so it costs a
+    fraction of a full extraction. cached_pages and parsed_pages are passed
+    to iter_pdf_pages.
+    """
+    candidates = pages or list(range(1, count_pdf_pages(pdf_path) + 1))
+    count = min(PRESCAN_SAMPLE_PAGES, len(candidates))
+    sample = [candidates[i * len(candidates) // count] for i in range(count)] if count else []
+    
+    ruled_pages = 0
+    text_pages = 0
+    for page in iter_pdf_pages(pdf_path, sample, cached_pages, parsed_pages):
+        if len(page.lines) + len(page.rects) >= PRESCAN_MIN_RULINGS:
+            ruled_pages += 1
+        if page.chars:
+            text_pages += 1
+    
+    return {
+        "sampled_pages": sample,
+        "ruled_pages": ruled_pages,
+        "text_pages": text_pages
+    }
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF without parsing their content"""
+    import pdfplumber
+    
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def split_pages(pages: List[int], shards: int) -> List[List[int]]:
+    """Split a list of page numbers into contiguous, near-equal shards"""
+    size, extra = divmod(len(pages), shards)
+    ranges = []
+    first = 0
+    for i in range(shards):
+        last = first + size + (1 if i < extra else 0)
+        ranges.append(pages[first:last])
+        first = last
+    return ranges
+
+
+def parse_page_range(spec: str, page_count: int) -> List[int]:
+    """Turn a page range like "1-3,5,8-" into sorted 1-based page numbers
+    
+    Open-ended ranges run to the last page and pages past the end of the
+    document are dropped, so "4-" selects nothing in a 3-page document.
+    """
+    selected = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if '-' in part:
+                start, end = part.split('-', 1)
+                start = int(start) if start.strip() else 1
+                # An open end past the last page selects nothing rather than failing
+                end = int(end) if end.strip() else max(page_count, start)
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid page range: {spec}")
+        
+        if start < 1 or end < start:
+            raise HTTPException(status_code=400, detail=f"Invalid page range: {spec}")
+        selected.update(range(start, min(end, page_count) + 1))
+    return sorted(selected)
+
+
+async def resolve_pages(pdf_path: str, pages: str = None, since_page: int = None):
+    """Page numbers selected by the pages / since_page parameters, None for all pages"""
+    if pages is None and since_page is None:
+        return None
+    
+    page_count = await run_in_worker('pdfplumber', count_pdf_pages, pdf_path)
+    if since_page is not None:
+        selected = parse_page_range(f"{since_page}-", page_count)
+    else:
+        selected = parse_page_range(pages, page_count)
+    check_page_limit(len(selected))
+    return selected
+
+
+def check_page_limit(page_count: int):
+    """Reject extractions of more than MAX_PDF_PAGES pages with 413"""
+    if MAX_PDF_PAGES and page_count > MAX_PDF_PAGES:
+        raise ExtractionLimitError(
+            status_code=413,
+            detail=f"PDF has {page_count} pages to extract, the limit is {MAX_PDF_PAGES}."
+        )
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Resident memory of a process and all of its descendants, read from /proc"""
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total / (1024 * 1024)
+
+
+def run_limited_child(connection, func, args):
+    """Body of a worker process: run func(*args) and send back the outcome"""
+    # Own process group, so killing it also stops any java it launched
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    
+    if EXTRACTION_MAX_RSS_MB and not os.path.isdir('/proc/self'):
+        # No /proc for the parent to watch RSS, cap the address space instead
+        try:
+            import resource
+            limit = EXTRACTION_MAX_RSS_MB * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+    
+    try:
+        outcome = (True, func(*args))
+    except Exception as e:
+        outcome = (False, e)
+    
+    try:
+        connection.send(outcome)
+    except Exception:
+        # The exception itself could not be pickled
+        connection.send((False, RuntimeError(str(outcome[1]))))
+    connection.close()
+
+
+def kill_worker(process):
+    """Kill a worker process together with its process group"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, OSError):
+        process.kill()
+
+
+def supervise_worker(func, args: tuple, deadline: Optional[float], cancelled: threading.Event):
+    """Run func(*args) in a new worker process and wait for its result
+    
+    The worker is killed when it passes the deadline (504), when it and its
+    children grow past EXTRACTION_MAX_RSS_MB (413) or when cancelled is
+    set. Blocks, so it runs on a supervisor thread.
+    """
+    receiver, sender = worker_context.Pipe(duplex=False)
+    process = worker_context.Process(target=run_limited_child, args=(sender, func, args), daemon=True)
+    process.start()
+    sender.close()
+    watch_rss = EXTRACTION_MAX_RSS_MB and os.path.isdir('/proc/self')
+    
+    try:
+        while not receiver.poll(0.05):
+            if not process.is_alive() and not receiver.poll():
+                raise RuntimeError(f"Extraction worker exited with code {process.exitcode}")
+            if cancelled.is_set():
+                raise RuntimeError("Extraction cancelled")
+            if deadline is not None and time.monotonic() > deadline:
+                LIMIT_KILLS_TOTAL.labels('timeout').inc()
+                raise ExtractionLimitError(
+                    status_code=504,
+                    detail=f"Extraction timed out after {EXTRACTION_TIMEOUT_SECONDS:g} seconds."
+                )
+            if watch_rss and process_tree_rss_mb(process.pid) > EXTRACTION_MAX_RSS_MB:
+                LIMIT_KILLS_TOTAL.labels('memory').inc()
+                raise ExtractionLimitError(
+                    status_code=413,
+                    detail=f"Extraction went over the memory limit of {EXTRACTION_MAX_RSS_MB} MB."
+                )
+        ok, value = receiver.recv()
+    except EOFError:
+        process.join(timeout=1)
+        raise RuntimeError(f"Extraction worker exited with code {process.exitcode}")
+    finally:
+        if process.is_alive():
+            kill_worker(process)
+        process.join()
+        receiver.close()
+    
+    if ok:
+        return value
+    raise value
+
+
+def remaining_time() -> Optional[float]:
+    """Deadline of the current extraction, or a fresh one for a single call"""
+    deadline = extraction_deadline.get()
+    if deadline is None and EXTRACTION_TIMEOUT_SECONDS:
+        deadline = time.monotonic() + EXTRACTION_TIMEOUT_SECONDS
+    return deadline
+
+
+@contextmanager
+def extraction_time_limit():
+    """Share one EXTRACTION_TIMEOUT_SECONDS budget across an extraction's steps"""
+    if extraction_deadline.get() is not None or not EXTRACTION_TIMEOUT_SECONDS:
+        yield
+        return
+    token = extraction_deadline.set(time.monotonic() + EXTRACTION_TIMEOUT_SECONDS)
+    try:
+        yield
+    finally:
+        extraction_deadline.reset(token)
+
+
+async def run_in_worker(pool: str, func, *args):
+    """Run func(*args) in a killable worker process, limited by the pool's size"""
+    cancelled = threading.Event()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            worker_pools[pool], supervise_worker, func, args, remaining_time(), cancelled
+        )
+    except asyncio.CancelledError:
+        # Kill the worker when the caller gives up on it (race mode)
+        cancelled.set()
+        raise
+
+
+async def count_pages(pdf_path: str) -> int:
+    """Count a PDF's pages in a worker process and apply MAX_PDF_PAGES"""
+    page_count = await run_in_worker('pdfplumber', count_pdf_pages, pdf_path)
+    check_page_limit(page_count)
+    return page_count
+
+
+def start_worker_pools():
+    """Start the fork server for worker processes and the supervisor threads"""
+    global worker_context
+    
+    # Workers are forked from a fork server with this module and pdfplumber
+    # preloaded, so a new one starts in milliseconds and none inherits the
+    # JVM or threads
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        worker_context = multiprocessing.get_context('forkserver')
+        worker_context.set_forkserver_preload([__name__, 'pdfplumber'])
+    else:
+        worker_context = multiprocessing.get_context()
+    
+    worker_pools['pdfplumber'] = ThreadPoolExecutor(
+        max_workers=PDFPLUMBER_WORKERS,
+        thread_name_prefix='pdfplumber'
+    )
+    worker_pools['tabula'] = ThreadPoolExecutor(
+        max_workers=TABULA_WORKERS,
+        thread_name_prefix='tabula'
+    )
+
+
+def start_fork_server():
+    """Start the fork server by running a no-op worker
+    
+    Must happen before the JVM starts in this process, so the fork server
+    does not inherit it.
+    """
+    supervise_worker(os.getpid, (), None, threading.Event())
+
+
+def stop_worker_pools():
+    """Shut down the extraction worker pools"""
+    for name, pool in worker_pools.items():
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            worker_pools[name] = None
+
+
+def note_tabula_hang(future):
+    """Count a jpype tabula call still running past its timeout, until it finishes
+    
+    Hung calls hold tabula threads that cannot be killed. Once
+    TABULA_MAX_HUNG_CALLS of them are running, tabula switches to subprocess
+    mode on a new thread pool, so later calls get killable workers instead
+    of queueing behind the hung ones.
+    """
+    def finished(_):
+        with tabula_hung_lock:
+            tabula_engine['hung_calls'] -= 1
+    
+    with tabula_hung_lock:
+        tabula_engine['hung_calls'] += 1
+        switch = (TABULA_MAX_HUNG_CALLS > 0 and tabula_engine['mode'] == 'jpype'
+                  and tabula_engine['hung_calls'] >= TABULA_MAX_HUNG_CALLS)
+        if switch:
+            tabula_engine['mode'] = 'subprocess'
+            hung_pool = worker_pools['tabula']
+            worker_pools['tabula'] = ThreadPoolExecutor(
+                max_workers=TABULA_WORKERS,
+                thread_name_prefix='tabula'
+            )
+    future.add_done_callback(finished)
+    
+    if switch:
+        print(f"{TABULA_MAX_HUNG_CALLS} tabula calls hung past their timeout, switching to subprocess mode")
+        hung_pool.shutdown(wait=False)
+
+
+async def run_tabula(pdf_path: str, **options) -> List[pd.DataFrame]:
+    """Run tabula under the extraction limits
+    
+    In subprocess mode tabula runs in a killable worker process. In jpype
+    mode it runs on the tabula threads of this process; a timeout answers
+    504 but the JVM call keeps its thread until it finishes, see
+    note_tabula_hang.
+    """
+    # The mode (jpype or subprocess) is settled by the boot at startup
+    if tabula_booted is not None:
+        await tabula_booted.wait()
+    
+    pages = options.get('pages')
+    if not isinstance(pages, list):
+        pages = range(await count_pages(pdf_path))
+    
+    with STAGE_SECONDS.labels('tabula').time():
+        if tabula_engine['mode'] == 'subprocess':
+            tables = await run_in_worker('tabula', read_pdf_with_java, pdf_path, options)
+        else:
+            deadline = remaining_time()
+            future = worker_pools['tabula'].submit(read_pdf_with_tabula, pdf_path, **options)
+            try:
+                tables = await asyncio.wait_for(
+                    asyncio.wrap_future(future),
+                    timeout=max(deadline - time.monotonic(), 0) if deadline else None
+                )
+            except asyncio.TimeoutError:
+                LIMIT_KILLS_TOTAL.labels('timeout').inc()
+                note_tabula_hang(future)
+                raise ExtractionLimitError(
+                    status_code=504,
+                    detail=f"Extraction timed out after {EXTRACTION_TIMEOUT_SECONDS:g} seconds."
+                )
+    
+    PAGES_TOTAL.labels('tabula').inc(len(pages))
+    return tables
+
+
+def run_with_page_snapshots(func, pdf_path: str, pages: Optional[List[int]], args: tuple,
+                            cached_pages: Optional[Dict[int, bytes]], snapshot_bytes: int):
+    """Worker body of a pdfplumber pass: run func and collect snapshots of the pages it parses
+    
+    Snapshots are collected until they reach snapshot_bytes, so a document
+    too big for the page cache is not sent back. Returns (result, snapshots).
+    """
+    parsed_pages = {} if snapshot_bytes > 0 else None
+    result = func(pdf_path, pages, *args, cached_pages=cached_pages, parsed_pages=parsed_pages)
+    
+    snapshots = {}
+    total = 0
+    for number, snapshot in (parsed_pages or {}).items():
+        total += len(snapshot)
+        if total > snapshot_bytes:
+            break
+        snapshots[number] = snapshot
+    return result, snapshots
+
+
+async def run_pdfplumber_pass(func, pdf_path: str, pages: Optional[List[int]], *args):
+    """Run a pdfplumber function in a worker process through the page cache
+    
+    The worker gets the cached snapshots of this upload's pages (keyed by
+    document_hash) and parses only the others; the snapshots of those are
+    cached for the next pass. Without a document hash it just runs func.
+    """
+    content_hash = document_hash.get()
+    snapshot_bytes = page_cache.max_bytes if content_hash is not None else 0
+    cached_pages = page_cache.get(content_hash, pages) if snapshot_bytes and pages else None
+    
+    result, snapshots = await run_in_worker(
+        'pdfplumber', run_with_page_snapshots, func, pdf_path, pages, args, cached_pages, snapshot_bytes
+    )
+    if snapshots:
+        page_cache.put(content_hash, snapshots)
+    return result
+
+
+async def run_pdfplumber(pdf_path: str, pages: List[int] = None,
+                         table_settings: Dict[str, Any] = None, layout: str = "rows") -> list:
+    """Run pdfplumber in killable worker processes
+    
+    Long PDFs are split into page shards that run on separate workers, each
+    opening the file itself. Shard rows are merged back in page order, so
+    the result is the same as a single pass over the document. Pages parsed
+    by an earlier pass over the same upload come from the page cache.
+    layout "tables" returns one {"page", "bbox", "rows"} dict per table
+    instead of all rows in one list.
+    
+    pages limits extraction to the given 1-based page numbers
+    """
+    extract = extract_tables_with_pdfplumber if layout == "tables" else extract_rows_with_pdfplumber
+    if pages is None:
+        page_count = await count_pages(pdf_path)
+        pages = list(range(1, page_count + 1))
+    
+    shards = 1
+    if PDFPLUMBER_PAGE_WORKERS > 1:
+        shards = min(PDFPLUMBER_PAGE_WORKERS, len(pages) // max(PDFPLUMBER_MIN_SHARD_PAGES, 1))
+    
+    with STAGE_SECONDS.labels('pdfplumber').time():
+        if shards <= 1:
+            all_tables = await run_pdfplumber_pass(extract, pdf_path, pages, table_settings)
+        else:
+            results = await asyncio.gather(*[
+                run_pdfplumber_pass(extract, pdf_path, shard, table_settings)
+                for shard in split_pages(pages, shards)
+            ])
+            
+            all_tables = []
+            for rows in results:
+                all_tables.extend(rows)
+    
+    PAGES_TOTAL.labels('pdfplumber').inc(len(pages))
+    return all_tables
+
+
+def upload_too_large(detail: str = None) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=detail or f"File too large. The maximum upload size is {MAX_UPLOAD_MB} MB."
+    )
+
+
+async def save_upload(file: UploadFile, reuse_spooled: bool = True, directory: str = None) -> Tuple[str, str]:
+    """Stream an uploaded PDF to disk in chunks and hash it on the way
+    
+    When Starlette has already spooled the upload to its own disk file,
+    that file is handed to the extractors through /proc instead of being
+    copied a second time. Pass reuse_spooled=False when the PDF has to
+    outlive the request, since Starlette closes the upload once the
+    endpoint returns. directory overrides where the copy is written.
+    
+    Returns the PDF path and the SHA-256 of its content.
+    """
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    if file.size is not None and file.size > limit:
+        raise upload_too_large()
+    
+    digest = hashlib.sha256()
+    spooled = file.file
+    total = 0
+    
+    if reuse_spooled and getattr(spooled, '_rolled', False) and os.path.isdir('/proc/self/fd'):
+        started = time.perf_counter()
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            total += len(chunk)
+            if total > limit:
+                raise upload_too_large()
+            digest.update(chunk)
+        await file.seek(0)
+        STAGE_SECONDS.labels('upload_read').observe(time.perf_counter() - started)
+        return f"/proc/{os.getpid()}/fd/{spooled.fileno()}", digest.hexdigest()
+    
+    read_seconds = 0.0
+    write_seconds = 0.0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir=directory) as tmp:
+        try:
+            while True:
+                started = time.perf_counter()
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                read_seconds += time.perf_counter() - started
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > limit:
+                    raise upload_too_large()
+                digest.update(chunk)
+                started = time.perf_counter()
+                tmp.write(chunk)
+                write_seconds += time.perf_counter() - started
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+        started = time.perf_counter()
+    write_seconds += time.perf_counter() - started  # flush and close
+    
+    STAGE_SECONDS.labels('upload_read').observe(read_seconds)
+    STAGE_SECONDS.labels('temp_write').observe(write_seconds)
+    return tmp.name, digest.hexdigest()
+
+
+def remove_upload(pdf_path: str):
+    """Delete a temporary PDF written by save_upload"""
+    if pdf_path and not pdf_path.startswith('/proc/') and os.path.exists(pdf_path):
+        os.unlink(pdf_path)
+
+
+def reserve_extraction_slot(check: bool = True):
+    """Count an extraction in flight, rejecting with 503 when the queue is full"""
+    global extractions_in_flight
+    
+    if check and extractions_in_flight >= EXTRACTION_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=503,
+            detail="Extraction queue is full. Please retry later.",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    
+    extractions_in_flight += 1
+
+
+def release_extraction_slot():
+    global extractions_in_flight
+    extractions_in_flight -= 1
+
+
+async def extraction_slot():
+    """Dependency that holds a place in the extraction queue for the request"""
+    reserve_extraction_slot()
+    try:
+        yield
+    finally:
+        release_extraction_slot()
+
+
+def header_labels(cells) -> List[str]:
+    """Header cells as single-spaced text, blank for empty and tabula's "Unnamed: n" cells"""
+    import pandas as pd
+    
+    labels = []
+    for cell in cells:
+        label = "" if cell is None or pd.isna(cell) else " ".join(str(cell).split())
+        labels.append("" if re.fullmatch(r"Unnamed: \d+", label) else label)
+    return labels
+
+
+def column_names(labels: List[str]) -> List[str]:
+    """Name blank header cells after their position and number repeated names"""
+    names = []
+    seen = {}
+    for position, label in enumerate(labels, 1):
+        name = label or f"column_{position}"
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+
+def align_tables(tables: List[pd.DataFrame]) -> Tuple[List[pd.DataFrame], Dict[str, str]]:
+    """Put tabula tables on one schema before they are concatenated
+    
+    Columns are matched to the first table's by name, ignoring case. A table
+    as wide as the first whose "header" holds numbers is a continuation page
+    tabula read its first data row from: that row goes back into the data
+    and the columns are taken by position. Consecutive tables that end up
+    with the same columns are stacked into one DataFrame. Returns those and
+    the header label of every column name.
+    """
+    import pandas as pd
+    import numpy as np
+    
+    reference = None
+    label_of = {}
+    runs = []
+    for table in tables:
+        labels = header_labels(table.columns)
+        names = column_names(labels)
+        values = table.to_numpy(dtype=object)
+        if reference is None:
+            reference = names
+        elif len(names) == len(reference) and any(re.fullmatch(NUMBER_PATTERN, label) for label in labels):
+            first_row = np.array([[label or None for label in labels]], dtype=object)
+            values = np.vstack([first_row, values])
+            names = reference
+        else:
+            by_lower = {name.lower(): name for name in reference}
+            names = [by_lower.get(name.lower(), name) for name in names]
+        
+        for name, label in zip(names, labels):
+            label_of.setdefault(name, label)
+        if runs and runs[-1][0] == names:
+            runs[-1][1].append(values)
+        else:
+            runs.append((names, [values]))
+    
+    return [pd.DataFrame(np.vstack(blocks), columns=names) for names, blocks in runs], label_of
+
+
+def strip_text(df: pd.DataFrame) -> pd.DataFrame:
+    """Strip every text cell and collapse whitespace runs (wrapped cell text)
+    
+    Text columns come back as Arrow-backed strings, so this and the later
+    steps run in Arrow's string kernels instead of a Python call per cell.
+    """
+    import numpy as np
+    
+    df = df.copy()
+    for position in np.flatnonzero((df.dtypes == object).to_numpy()):
+        text = df.iloc[:, position].astype("string[pyarrow]").str.strip()
+        wrapped = text.str.contains(r"\s\s|[\t\n\r\f\v]").to_numpy(dtype=bool, na_value=False)
+        if wrapped.any():
+            text[wrapped] = text[wrapped].str.replace(r"\s+", " ", regex=True)
+        df.isetitem(position, text)
+    return df
+
+
+def drop_header_rows(df: pd.DataFrame, labels: List[str]) -> pd.DataFrame:
+    """Drop rows that repeat the header (one per page in pdfplumber output) and empty rows"""
+    import numpy as np
+    
+    blank = np.ones(len(df), dtype=bool)
+    repeated = np.ones(len(df), dtype=bool)
+    for position, label in enumerate(labels):
+        column = df.iloc[:, position]
+        empty = (column.isna() | column.eq("")).to_numpy(dtype=bool, na_value=False)
+        blank &= empty
+        repeated &= empty if label == "" else column.eq(label).to_numpy(dtype=bool, na_value=False)
+    return df[~(blank | repeated)].reset_index(drop=True)
+
+
+def coerce_column(column: pd.Series) -> pd.Series:
+    """Turn a text column whose every value is a number or a date into that type
+    
+    Values with leading zeros (ids, codes) stay text.
+    """
+    import pandas as pd
+    
+    if column.dtype != "string":
+        return column
+    present = (column.notna() & column.ne("")).to_numpy(dtype=bool, na_value=False)
+    if not present.any():
+        return column
+    text = column[present]
+    
+    if text.str.fullmatch(NUMBER_PATTERN).all() and not text.str.match(r"\(?-?[$€£]?0\d").any():
+        digits = text.str.replace(",", "", regex=False)
+        currency = digits.str.contains(r"[$€£]").to_numpy(dtype=bool)
+        if currency.any():
+            digits[currency] = digits[currency].str.replace(r"[$€£]", "", regex=True)
+        negative = digits.str.startswith("(").to_numpy(dtype=bool)
+        if negative.any():
+            digits[negative] = "-" + digits[negative].str.strip("()")
+        integral = not digits.str.contains(".", regex=False).any()
+        try:
+            numbers = digits.astype("int64[pyarrow]" if integral else "float64[pyarrow]")
+        except ValueError:
+            # Too big for int64
+            numbers = None
+        if numbers is not None:
+            numbers = numbers.astype("Int64" if integral else "float64")
+            # Whole numbers written as 7.0 (tabula's float columns) are integers too
+            if not integral and (numbers % 1 == 0).all():
+                numbers = numbers.astype("Int64")
+            return numbers.reindex(column.index)
+    
+    # Check the layout on one value before parsing the whole column with it
+    first = text.iloc[0]
+    for layout in NORMALIZE_DATE_FORMATS:
+        try:
+            datetime.strptime(first, layout)
+        except ValueError:
+            continue
+        dates = pd.to_datetime(text, format=layout, errors="coerce")
+        if dates.notna().all():
+            return dates.reindex(column.index)
+    return column
+
+
+def normalize_frame(df: pd.DataFrame, labels: List[str]) -> pd.DataFrame:
+    """Clean an extracted table whose header cells are labels
+    
+    Strips text, drops repeated header and empty rows and coerces number and
+    date columns, one column at a time.
+    """
+    with STAGE_SECONDS.labels('normalize').time():
+        df = drop_header_rows(strip_text(df), labels)
+        for position in range(df.shape[1]):
+            df.isetitem(position, coerce_column(df.iloc[:, position]))
+        return df
+
+
+def tables_to_frame(tables: List[pd.DataFrame], normalize: bool = False) -> pd.DataFrame:
+    """Concatenate tabula tables and blank out missing values
+    
+    normalize aligns the tables' columns first and cleans the result with
+    normalize_frame, leaving missing values as NaN.
+    """
+    import pandas as pd
+    
+    with STAGE_SECONDS.labels('dataframe').time():
+        if not normalize:
+            return pd.concat(tables, ignore_index=True).fillna("")
+        tables, label_of = align_tables(tables)
+        df = pd.concat(tables, ignore_index=True)
+    return normalize_frame(df, [label_of[name] for name in df.columns])
+
+
+def rows_to_frame(rows: List[List[Any]], normalize: bool = False) -> pd.DataFrame:
+    """Turn pdfplumber rows into a DataFrame, the first row being the header
+    
+    normalize cleans it with normalize_frame, which also drops the header
+    every later page repeats.
+    """
+    import pandas as pd
+    
+    with STAGE_SECONDS.labels('dataframe').time():
+        if not normalize:
+            return pd.DataFrame(rows[1:], columns=rows[0]).fillna("")
+        df = pd.DataFrame(rows[1:])
+        width = max(df.shape[1], len(rows[0]))
+        df = df.reindex(columns=range(width))
+        labels = header_labels(list(rows[0]) + [""] * (width - len(rows[0])))
+        df.columns = column_names(labels)
+    return normalize_frame(df, labels)
+
+
+def output_to_frame(method: str, output: list, normalize: bool = False) -> pd.DataFrame:
+    """Turn an engine's output (tabula tables or pdfplumber rows) into one DataFrame"""
+    if method == "tabula":
+        return tables_to_frame(output, normalize)
+    return rows_to_frame(output, normalize)
+
+
+def column_types(df: pd.DataFrame) -> Dict[str, str]:
+    """Map each column to integer, number, date or text"""
+    import pandas as pd
+    
+    types = {}
+    for name, dtype in df.dtypes.items():
+        if pd.api.types.is_integer_dtype(dtype):
+            types[name] = "integer"
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            types[name] = "number"
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            types[name] = "date"
+        else:
+            types[name] = "text"
+    return types
+
+
+def frame_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Rows of a normalized DataFrame as JSON-ready dicts: ISO dates, None for missing"""
+    import pandas as pd
+    import numpy as np
+    
+    df = df.copy()
+    for position in np.flatnonzero([pd.api.types.is_datetime64_any_dtype(dtype) for dtype in df.dtypes]):
+        df.isetitem(position, df.iloc[:, position].dt.strftime("%Y-%m-%d"))
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict(orient="records")
+
+
+def frame_result(df: pd.DataFrame, method: str, with_method: bool = True,
+                 normalized: bool = False, **details) -> Dict[str, Any]:
+    """Build the success result for an extracted DataFrame and count it
+    
+    details (the engine and why it was picked) go right after the method.
+    A normalized DataFrame also gets the type of each column.
+    """
+    with STAGE_SECONDS.labels('serialization').time():
+        data = frame_records(df) if normalized else df.to_dict(orient="records")
+    EXTRACTIONS_TOTAL.labels(method).inc()
+    ROWS_TOTAL.labels(method).inc(len(df))
+    
+    result = {"status": "success"}
+    if with_method:
+        result["method"] = method
+    result.update(details)
+    result.update({
+        "rows": len(df),
+        "columns": df.columns.tolist(),
+        "data": data
+    })
+    if normalized:
+        result["column_types"] = column_types(df)
+    return result
+
+
+def table_frame(rows: List[List[Any]], normalize: bool = False) -> pd.DataFrame:
+    """Turn one table's rows into a DataFrame, the first row naming its columns"""
+    import pandas as pd
+    
+    if normalize:
+        return rows_to_frame(rows, normalize=True)
+    with STAGE_SECONDS.labels('dataframe').time():
+        return pd.DataFrame(rows[1:], columns=column_names(header_labels(rows[0]))).fillna("")
+
+
+def tables_result(tables: List[Dict[str, Any]], method: str, normalize: bool = False,
+                  **details) -> Dict[str, Any]:
+    """Build the layout=tables result: every table with its page, bbox and own columns
+    
+    details (the engine and why it was picked) go right after the method
+    """
+    entries = []
+    for index, table in enumerate(tables):
+        df = table_frame(table["rows"], normalize)
+        with STAGE_SECONDS.labels('serialization').time():
+            data = frame_records(df) if normalize else df.to_dict(orient="records")
+        entry = {
+            "index": index,
+            "page": table["page"],
+            "bbox": table["bbox"],
+            "rows": len(df),
+            "columns": df.columns.tolist(),
+            "data": data
+        }
+        if normalize:
+            entry["column_types"] = column_types(df)
+        entries.append(entry)
+    
+    total = sum(entry["rows"] for entry in entries)
+    EXTRACTIONS_TOTAL.labels(method).inc()
+    ROWS_TOTAL.labels(method).inc(total)
+    
+    result = {"status": "success", "method": method}
+    result.update(details)
+    result.update({
+        "layout": "tables",
+        "rows": total,
+        "tables": entries
+    })
+    return result
+
+
+# Reason given for the fallback plan when the pre-scan itself fails
+PRESCAN_FAILED = "pre-scan failed"
+
+def engine_details(engine: Optional[str], reason: str, engine_failed: bool = False) -> Dict[str, Any]:
+    """The engine and engine_reason of a result, plus engine_failed when an engine or the pre-scan raised"""
+    details = {"engine": engine, "engine_reason": reason}
+    if engine_failed or reason.startswith(PRESCAN_FAILED):
+        details["engine_failed"] = True
+    return details
+
+
+async def plan_engines(pdf_path: str, pages: List[int] = None) -> Tuple[List[str], str]:
+    """Pre-scan a PDF and return the engines to try, in order, and why
+    
+    Ruled pages go to tabula's lattice mode, borderless text to its stream
+    mode, each with the matching pdfplumber finder as fallback. Plans
+    wait for the tabula boot; without a working tabula engine only
+    pdfplumber is planned, and a PDF with no text layer is not extracted
+    at all.
+    """
+    try:
+        scan = await run_pdfplumber_pass(scan_pdf_layout, pdf_path, pages)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Pre-scan failed: {e}")
+        scan = None
+    
+    sampled = len(scan["sampled_pages"]) if scan else 0
+    if scan is None:
+        plan, reason = ["tabula-lattice", "pdfplumber"], PRESCAN_FAILED
+    elif not scan["text_pages"]:
+        plan, reason = [], f"no text on {sampled} sampled pages"
+    elif scan["ruled_pages"] * 2 >= sampled:
+        plan, reason = ["tabula-lattice", "pdfplumber"], f"ruling lines on {scan['ruled_pages']}/{sampled} sampled pages"
+    else:
+        plan, reason = ["tabula-stream", "pdfplumber-text"], f"no ruling lines on {sampled - scan['ruled_pages']}/{sampled} sampled pages"
+    
+    # Wait for the tabula boot, so requests arriving during startup get
+    # (and cache) the same plan as later ones
+    if tabula_booted is not None and plan:
+        await tabula_booted.wait()
+    if not tabula_engine['ready'] and plan:
+        plan = [engine for engine in plan if not engine.startswith("tabula")]
+        reason += ", tabula engine unavailable"
+    
+    if plan:
+        ENGINE_CHOICES_TOTAL.labels(plan[0]).inc()
+    return plan, reason
+
+
+async def run_engine(engine: str, pdf_path: str, pages: List[int] = None,
+                     layout: str = "rows") -> Tuple[str, list]:
+    """Run one planned engine, returning ("tabula", DataFrames) or ("pdfplumber", rows)
+    
+    With layout "tables" both engines return {"page", "bbox", "rows"} dicts
+    instead, one per table.
+    """
+    if engine.startswith("tabula"):
+        options = dict(TABULA_STREAM_OPTIONS) if engine == "tabula-stream" else {}
+        if layout == "tables":
+            options['output_format'] = 'json'
+            raw_tables = await run_tabula(pdf_path, pages=pages or "all", **options)
+            return "tabula", tabula_json_tables(raw_tables)
+        tables = await run_tabula(pdf_path, pages=pages or "all", **options)
+        return "tabula", [table for table in tables if not table.empty]
+    
+    settings = PDFPLUMBER_TEXT_SETTINGS if engine == "pdfplumber-text" else None
+    return "pdfplumber", await run_pdfplumber(pdf_path, pages, settings, layout)
+
+
+def check_quality(method: str, output: list) -> Optional[str]:
+    """Return why an engine's output is not usable, or None if it passes
+    
+    A usable result is non-empty, has at least two columns and keeps one
+    column count for at least RACE_MIN_CONSISTENCY of its rows.
+    """
+    if not output:
+        return "found no tables"
+    
+    widths = {}
+    if method == "tabula":
+        for table in output:
+            widths[len(table.columns)] = widths.get(len(table.columns), 0) + len(table)
+    else:
+        for row in output:
+            widths[len(row)] = widths.get(len(row), 0) + 1
+    
+    width, rows = max(widths.items(), key=lambda item: item[1])
+    total = sum(widths.values())
+    if width < 2:
+        return "found single-column tables"
+    if total and rows / total < RACE_MIN_CONSISTENCY:
+        return f"has inconsistent column counts ({rows}/{total} rows have {width})"
+    return None
+
+
+async def race_extraction(pdf_path: str, pages: List[int] = None, normalize: bool = False) -> Dict[str, Any]:
+    """Start every planned engine at once and keep the first usable result
+    
+    The other engines are cancelled as soon as one passes check_quality:
+    their pdfplumber shards that have not started yet are dropped and the
+    request stops waiting for them (a tabula call already running in its
+    thread finishes in the background). When no engine passes, the first
+    non-empty result is returned.
+    """
+    plan, reason = await plan_engines(pdf_path, pages)
+    tasks = {
+        asyncio.create_task(run_engine(engine, pdf_path, pages)): engine
+        for engine in plan
+    }
+    pending = set(tasks)
+    notes = []
+    winner = None
+    fallback = None
+    engine_failed = False
+    
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda task: plan.index(tasks[task])):
+                engine = tasks[task]
+                try:
+                    method, output = task.result()
+                except HTTPException:
+                    raise
+                except Exception as engine_error:
+                    print(f"{engine} extraction failed: {engine_error}")
+                    notes.append(f"{engine} failed")
+                    engine_failed = True
+                    continue
+                
+                problem = check_quality(method, output)
+                if problem is None:
+                    winner = (engine, method, output)
+                    break
+                notes.append(f"{engine} {problem}")
+                if output and fallback is None:
+                    fallback = (engine, method, output)
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    if winner:
+        notes.insert(0, f"race won by {winner[0]}")
+    elif fallback:
+        winner = fallback
+        notes.insert(0, f"no engine passed the quality check, kept {fallback[0]}")
+    notes.extend(f"{tasks[task]} cancelled" for task in pending)
+    reason = "; ".join([reason] + notes)
+    
+    if not winner:
+        EXTRACTIONS_TOTAL.labels("none").inc()
+        return {
+            "status": "no_tables",
+            "message": "No tables found in the PDF file",
+            **engine_details(None, reason, engine_failed)
+        }
+    
+    engine, method, output = winner
+    df = output_to_frame(method, output, normalize)
+    return frame_result(df, method, normalized=normalize, **engine_details(engine, reason, engine_failed))
+
+
+async def run_extraction(pdf_path: str, pages: List[int] = None, strategy: str = "auto",
+                         normalize: bool = False, layout: str = "rows") -> Dict[str, Any]:
+    """Extract tables with the engine the pre-scan picks
+    
+    An engine that fails or finds nothing hands over to the next one in the
+    plan. The result records the engine that produced it and why, and is
+    marked engine_failed (so it is not cached) when an engine raised.
+    strategy "race" runs the planned engines at the same time instead.
+    All of it shares one EXTRACTION_TIMEOUT_SECONDS budget.
+    normalize cleans the result (see normalize_frame). layout "tables"
+    keeps every table apart (see tables_result) and always runs "auto".
+    
+    pages limits extraction to the given 1-based page numbers
+    """
+    if pages == []:
+        return {
+            "status": "no_tables",
+            "message": "No pages selected in the PDF file"
+        }
+    
+    # One wall-clock budget for the pre-scan and every engine tried
+    with extraction_time_limit():
+        if strategy == "race" and layout == "rows":
+            return await race_extraction(pdf_path, pages, normalize)
+        
+        plan, reason = await plan_engines(pdf_path, pages)
+        engine_failed = False
+        
+        for engine in plan:
+            try:
+                method, output = await run_engine(engine, pdf_path, pages, layout)
+            except HTTPException:
+                raise
+            except Exception as engine_error:
+                print(f"{engine} extraction failed: {engine_error}")
+                FALLBACKS_TOTAL.inc()
+                reason += f"; {engine} failed"
+                engine_failed = True
+                continue
+        
+            if output and layout == "tables":
+                return tables_result(output, method, normalize, **engine_details(engine, reason, engine_failed))
+            if output:
+                # Concatenate all tables and clean the data
+                df = output_to_frame(method, output, normalize)
+                return frame_result(df, method, normalized=normalize, **engine_details(engine, reason, engine_failed))
+        
+            FALLBACKS_TOTAL.inc()
+            reason += f"; {engine} found no tables"
+        
+        # If every planned engine fails, return no tables found
+        EXTRACTIONS_TOTAL.labels("none").inc()
+        return {
+            "status": "no_tables",
+            "message": "No tables found in the PDF file",
+            **engine_details(None, reason, engine_failed)
+        }
 
-# Load environment variables
-load_dotenv()
 
-# MySQL Configuration
-MYSQL_CONFIG = {
-    'host': os.getenv('MYSQL_HOST', 'localhost'),
-    'port': int(os.getenv('MYSQL_PORT', 3306)),
-    'user': os.getenv('MYSQL_USER', 'root'),
-    'password': os.getenv('MYSQL_PASSWORD', ''),
-    'database': os.getenv('MYSQL_DATABASE', 'crime_reports')
-}
+async def extract_page_batches(pdf_path: str, pages: List[int] = None, batch_size: int = None,
+                               plan: List[str] = None, layout: str = "rows", failures: List[str] = None):
+    """Run the planned engines over a PDF a batch of pages at a time
+    
+    An engine that raises is dropped for the rest of the document (and
+    added to failures, with a failed pre-scan, when a list is given); one
+    that finds nothing in a batch hands that batch to the next engine. Yields
+    (batch, method, output, engine) where output is the list of DataFrames
+    from tabula or the raw table rows from pdfplumber (table dicts for
+    layout "tables"). plan defaults to the pre-scan's choice.
+    """
+    batch_size = batch_size or STREAM_PAGE_BATCH
+    if pages is None:
+        page_count = await count_pages(pdf_path)
+        pages = list(range(1, page_count + 1))
+    if plan is None:
+        plan, reason = await plan_engines(pdf_path, pages)
+        if failures is not None and reason.startswith(PRESCAN_FAILED):
+            failures.append("pre-scan")
+    first_engine = 0
+    
+    for first in range(0, len(pages), batch_size):
+        batch = pages[first:first + batch_size]
+        method, output, engine = "pdfplumber", [], None
+        
+        for index in range(first_engine, len(plan)):
+            try:
+                method, output = await run_engine(plan[index], pdf_path, batch, layout)
+            except HTTPException:
+                raise
+            except Exception as engine_error:
+                print(f"{plan[index]} extraction failed: {engine_error}")
+                FALLBACKS_TOTAL.inc()
+                if failures is not None:
+                    failures.append(plan[index])
+                first_engine = index + 1
+                if first_engine == len(plan):
+                    raise
+                continue
+            engine = plan[index]
+            if output:
+                break
+        
+        yield batch, method, output, engine
 
-# Database connection pool
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        connection = mysql.connector.connect(**MYSQL_CONFIG)
-        return connection
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
 
-def create_tables():
-    """Create necessary database tables if they don't exist"""
-    connection = get_db_connection()
-    if not connection:
-        return False
+async def stream_extraction(pdf_path: str, pages: List[int] = None, failures: List[str] = None):
+    """Yield extracted rows as NDJSON, a batch of STREAM_PAGE_BATCH pages at a time
     
-    try:
-        cursor = connection.cursor()
+    Rows are sent as soon as their pages are done, so each tabula row
+    carries only its own table's columns. Engines that raised are added
+    to failures (see extract_page_batches).
+    """
+    header = None
+    
+    async for _, method, output, _ in extract_page_batches(pdf_path, pages, failures=failures):
+        lines = []
         
-        # Create extraction_logs table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS extraction_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                filename VARCHAR(255),
-                extraction_method VARCHAR(50),
-                rows_count INT,
-                columns_count INT,
-                extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status VARCHAR(50)
+        with STAGE_SECONDS.labels('serialization').time():
+            if method == "tabula":
+                for table in output:
+                    lines.extend(json.dumps(row) for row in table.fillna("").to_dict(orient="records"))
+            else:
+                # The first pdfplumber row is the header for the rest of the document
+                for row in output:
+                    if header is None:
+                        header = row
+                        continue
+                    lines.append(json.dumps({
+                        column: "" if value is None else value
+                        for column, value in zip(header, row)
+                    }))
+        ROWS_TOTAL.labels(method).inc(len(lines))
+        
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+
+async def stream_upload_rows(pdf_path: str, pages: List[int] = None, cache_key: str = None):
+    """Stream NDJSON rows for an upload, then free its queue slot and temp file
+    
+    A failure mid-stream ends it with an {"error", "status_code"} line, so
+    clients can tell a cut-short stream from a complete one. A complete
+    stream is cached under cache_key, unless an engine raised on the way
+    or it is larger than the memory tier of the result cache.
+    """
+    chunks = []
+    size = 0
+    failures = []
+    try:
+        async for chunk in stream_extraction(pdf_path, pages, failures):
+            yield chunk
+            if chunks is not None:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > result_cache.memory_bytes:
+                    chunks = None
+        if cache_key and chunks is not None and not failures:
+            await asyncio.to_thread(result_cache.put, cache_key, {"status": "success", "ndjson": "".join(chunks)})
+    except Exception as e:
+        print(f"NDJSON extraction failed: {e}")
+        if isinstance(e, HTTPException):
+            error = {"error": e.detail, "status_code": e.status_code}
+        else:
+            error = {"error": f"Error processing PDF: {str(e)}", "status_code": 500}
+        yield json.dumps(error) + "\n"
+    finally:
+        release_extraction_slot()
+        remove_upload(pdf_path)
+
+
+def build_batch_result(tables: List[pd.DataFrame], rows: List[List[Any]], normalize: bool = False,
+                       **details) -> Dict[str, Any]:
+    """Build an /extract style result from tabula tables and pdfplumber rows
+    
+    details (the engine and why it was picked) are added to the result
+    """
+    import pandas as pd
+    
+    frames = []
+    methods = []
+    if tables:
+        frames.append(tables_to_frame(tables, normalize))
+        methods.append("tabula")
+    if rows:
+        frames.append(rows_to_frame(rows, normalize))
+        methods.append("pdfplumber")
+    
+    if not frames:
+        EXTRACTIONS_TOTAL.labels("none").inc()
+        return {
+            "status": "no_tables",
+            "message": "No tables found in the PDF file",
+            **details
+        }
+    
+    if len(frames) > 1:
+        with STAGE_SECONDS.labels('dataframe').time():
+            df = pd.concat(frames, ignore_index=True)
+            if not normalize:
+                df = df.fillna("")
+    else:
+        df = frames[0]
+    
+    return frame_result(df, "+".join(methods), normalized=normalize, **details)
+
+
+def jobs_db():
+    """Open the SQLite job store"""
+    connection = sqlite3.connect(os.path.join(JOBS_DIR, 'jobs.db'), timeout=30)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+def create_jobs_table():
+    """Create the job store and requeue jobs interrupted by a restart
+    
+    Interrupted jobs that have used up JOB_MAX_ATTEMPTS are marked failed
+    instead, so a PDF that brings the server down is not retried forever.
+    """
+    os.makedirs(os.path.join(JOBS_DIR, 'uploads'), exist_ok=True)
+    os.makedirs(os.path.join(JOBS_DIR, 'results'), exist_ok=True)
+    
+    with closing(jobs_db()) as connection, connection:
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT,
+                pdf_path TEXT,
+                params TEXT,
+                status TEXT,
+                pages_done INTEGER DEFAULT 0,
+                pages_total INTEGER,
+                result_path TEXT,
+                extraction_id INTEGER,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                created_at TEXT,
+                updated_at TEXT
             )
         """)
+        columns = [row['name'] for row in connection.execute("PRAGMA table_info(jobs)")]
+        if 'attempts' not in columns:
+            connection.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER DEFAULT 0")
+        connection.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)
+        """)
         
-        # Create extracted_data table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS extracted_data (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                extraction_log_id INT,
-                row_data JSON,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (extraction_log_id) REFERENCES extraction_logs(id)
-            )
+        crashed = connection.execute("""
+            SELECT id, pdf_path, attempts FROM jobs WHERE status = 'running' AND attempts >= ?
+        """, (max(JOB_MAX_ATTEMPTS, 1),)).fetchall()
+        for job in crashed:
+            print(f"Job {job['id']} failed: interrupted on all {job['attempts']} attempts")
+            connection.execute("""
+                UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?
+            """, (
+                f"The server stopped during each of the job's {job['attempts']} attempts",
+                datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                job['id']
+            ))
+            remove_upload(job['pdf_path'])
+        connection.execute("""
+            UPDATE jobs SET status = 'queued', pages_done = 0 WHERE status = 'running'
         """)
+
+
+def enqueue_job(job_id: str, filename: str, pdf_path: str, params: Dict[str, Any]):
+    """Add a job to the queue"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with closing(jobs_db()) as connection, connection:
+        connection.execute("""
+            INSERT INTO jobs (id, filename, pdf_path, params, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, ?)
+        """, (job_id, filename, pdf_path, json.dumps(params), now, now))
+
+
+def claim_next_job():
+    """Mark the oldest queued job as running and return it, or None"""
+    with closing(jobs_db()) as connection:
+        while True:
+            with connection:
+                job = connection.execute("""
+                    SELECT * FROM jobs WHERE status = 'queued'
+                    ORDER BY created_at LIMIT 1
+                """).fetchone()
+                if not job:
+                    return None
+                
+                # Another worker process may have claimed it in the meantime
+                claimed = connection.execute("""
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
+                    WHERE id = ? AND status = 'queued'
+                """, (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), job['id'])).rowcount
+            if claimed:
+                job = dict(job)
+                job['attempts'] += 1
+                return job
+
+
+def update_job(job_id: str, **fields):
+    """Update columns of a job"""
+    fields['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with closing(jobs_db()) as connection, connection:
+        connection.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?",
+            (*fields.values(), job_id)
+        )
+
+
+def prune_jobs() -> int:
+    """Delete jobs that ended more than JOB_RETENTION_HOURS ago, with their files, returning how many"""
+    cutoff = (datetime.now() - timedelta(hours=JOB_RETENTION_HOURS)).strftime('%Y-%m-%d %H:%M:%S')
+    with closing(jobs_db()) as connection, connection:
+        expired = connection.execute("""
+            SELECT id, pdf_path, result_path FROM jobs
+            WHERE status IN ('done', 'failed') AND updated_at < ?
+        """, (cutoff,)).fetchall()
+        for job in expired:
+            for path in (job['result_path'], job['pdf_path']):
+                if path and os.path.exists(path):
+                    os.unlink(path)
+            connection.execute("DELETE FROM jobs WHERE id = ?", (job['id'],))
+    return len(expired)
+
+
+def get_job(job_id: str):
+    """Return a job as a dict, or None"""
+    with closing(jobs_db()) as connection:
+        job = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(job) if job else None
+
+
+async def submit_job(
+    file: UploadFile,
+    pages: str = None,
+    since_page: int = None,
+    persist: bool = False,
+    extraction_id: int = None,
+    normalize: bool = False,
+    layout: str = "rows"
+) -> Dict[str, Any]:
+    """Save an upload into the job store and queue it for the job workers"""
+    job_id = uuid.uuid4().hex
+    pdf_path, content_hash = await save_upload(
+        file,
+        reuse_spooled=False,
+        directory=os.path.join(JOBS_DIR, 'uploads')
+    )
+    
+    try:
+        page_list = await resolve_pages(pdf_path, pages, since_page)
+        await asyncio.to_thread(enqueue_job, job_id, file.filename, pdf_path, {
+            "pages": page_list,
+            "content_hash": content_hash,
+            "persist": persist or extraction_id is not None,
+            "extraction_id": extraction_id,
+            "normalize": normalize,
+            "layout": layout
+        })
+    except BaseException:
+        remove_upload(pdf_path)
+        raise
+    
+    if job_wakeup:
+        job_wakeup.set()
+    
+    return {
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}"
+    }
+
+
+async def run_job(job: Dict[str, Any]):
+    """Extract a job's PDF, recording progress after every batch of pages"""
+    job_id = job['id']
+    params = json.loads(job['params'])
+    pdf_path = job['pdf_path']
+    document_hash.set(params['content_hash'])
+    
+    try:
+        pages = params.get('pages')
+        if pages is None:
+            page_count = await count_pages(pdf_path)
+            pages = list(range(1, page_count + 1))
+        await asyncio.to_thread(update_job, job_id, pages_total=len(pages), pages_done=0)
+        plan, reason = await plan_engines(pdf_path, pages)
+        normalize = params.get('normalize', False)
+        layout = params.get('layout', 'rows')
         
-        connection.commit()
-        cursor.close()
-        connection.close()
-        return True
-    except Error as e:
-        print(f"Error creating tables: {e}")
-        return False
+        tables = []
+        rows = []
+        methods = []
+        engines = []
+        failures = []
+        pages_done = 0
+        async for batch, method, output, engine in extract_page_batches(pdf_path, pages, plan=plan, layout=layout,
+                                                                        failures=failures):
+            if method == "tabula" or layout == "tables":
+                tables.extend(output)
+            else:
+                rows.extend(output)
+            if output and method not in methods:
+                methods.append(method)
+            if output and engine not in engines:
+                engines.append(engine)
+            pages_done += len(batch)
+            await asyncio.to_thread(update_job, job_id, pages_done=pages_done)
+        
+        details = engine_details("+".join(engines) or None, reason, bool(failures))
+        if layout == "tables" and tables:
+            result = await asyncio.to_thread(tables_result, tables, "+".join(methods), normalize, **details)
+        elif layout == "tables":
+            result = await asyncio.to_thread(build_batch_result, [], [], **details)
+        else:
+            result = await asyncio.to_thread(build_batch_result, tables, rows, normalize, **details)
+        await asyncio.to_thread(
+            result_cache.put,
+            result_cache.make_key(params['content_hash'], 'auto', pages=params.get('pages'),
+                                  normalize=normalize, layout=layout),
+            result
+        )
+        
+        log_id = None
+        if params.get('extraction_id') is not None and params.get('pages') == []:
+            # since_page past the last page: nothing new to append
+            result = await asyncio.to_thread(append_no_pages, params['extraction_id'])
+            log_id = result["extraction_id"]
+        elif params.get('persist') and result["status"] == "success" and layout == "tables":
+            log_id = await asyncio.to_thread(
+                save_extraction_tables,
+                job['filename'],
+                result["method"],
+                result["tables"]
+            )
+            result = persisted_tables_summary(result, log_id)
+        elif params.get('persist') and result["status"] == "success":
+            if params.get('extraction_id') is not None:
+                log_id = await asyncio.to_thread(
+                    append_to_extraction,
+                    params['extraction_id'],
+                    result["columns"],
+                    result["data"]
+                )
+            else:
+                log_id = await asyncio.to_thread(
+                    save_extraction,
+                    job['filename'],
+                    result["method"],
+                    result["columns"],
+                    result["data"]
+                )
+            result = {
+                "status": "success",
+                "method": result["method"],
+                "rows": result["rows"],
+                "columns": result["columns"],
+                "extraction_id": log_id,
+                "appended": params.get('extraction_id') is not None
+            }
+        
+        result_path = os.path.join(JOBS_DIR, 'results', f"{job_id}.json")
+        with open(result_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        
+        await asyncio.to_thread(
+            update_job, job_id,
+            status='done', result_path=result_path, extraction_id=log_id
+        )
+    
+    except asyncio.CancelledError:
+        # Shut down: back to the queue without using up an attempt
+        update_job(job_id, status='queued', pages_done=0, attempts=job['attempts'] - 1)
+        raise
+    
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        await asyncio.to_thread(
+            update_job, job_id,
+            status='failed', error=str(getattr(e, 'detail', e))
+        )
+    
+    # Not reached when the worker is cancelled at shutdown, so the PDF is
+    # still there when the job is requeued on the next start
+    remove_upload(pdf_path)
+
+
+async def job_worker():
+    """Run queued jobs one at a time until cancelled"""
+    # Queued jobs wait for the tabula boot so they get the full engine plan
+    await tabula_booted.wait()
+    
+    while True:
+        try:
+            job = await asyncio.to_thread(claim_next_job)
+        except sqlite3.Error as e:
+            print(f"Job store error: {e}")
+            job = None
+        
+        if job is None:
+            job_wakeup.clear()
+            try:
+                await asyncio.wait_for(job_wakeup.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        
+        await run_job(job)
+
+
+async def job_janitor():
+    """Prune old jobs (see prune_jobs) now and then every hour until cancelled"""
+    while True:
+        try:
+            pruned = await asyncio.to_thread(prune_jobs)
+            if pruned:
+                print(f"Pruned {pruned} old jobs")
+        except sqlite3.Error as e:
+            print(f"Job store error: {e}")
+        await asyncio.sleep(3600)
+
+
+def unpack_zip_pdfs(zip_path: str) -> List[Tuple[str, str, str]]:
+    """Copy every PDF in a ZIP archive to its own temporary file
+    
+    Returns (name, path, sha256) for each PDF. The declared sizes are
+    checked against MAX_UPLOAD_MB per PDF, and the PDF count and total
+    size against ZIP_MAX_FILES and ZIP_MAX_TOTAL_MB, before anything is
+    written; reads never go past the declared size.
+    """
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    pdfs = []
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            members = [
+                info for info in archive.infolist()
+                if not info.is_dir()
+                and os.path.basename(info.filename).lower().endswith('.pdf')
+                and not info.filename.startswith('__MACOSX')
+            ]
+            if len(members) > ZIP_MAX_FILES:
+                raise upload_too_large(f"ZIP holds too many PDFs. The maximum is {ZIP_MAX_FILES} per archive.")
+            if any(info.file_size > limit for info in members):
+                raise upload_too_large()
+            if sum(info.file_size for info in members) > ZIP_MAX_TOTAL_MB * 1024 * 1024:
+                raise upload_too_large(f"ZIP too large. The maximum unpacked size is {ZIP_MAX_TOTAL_MB} MB per archive.")
+            
+            for info in members:
+                name = os.path.basename(info.filename)
+                digest = hashlib.sha256()
+                with archive.open(info) as member, \
+                        tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                    pdfs.append((name, tmp.name, None))
+                    while chunk := member.read(UPLOAD_CHUNK_SIZE):
+                        digest.update(chunk)
+                        tmp.write(chunk)
+                pdfs[-1] = (name, tmp.name, digest.hexdigest())
+    except BaseException:
+        for _, path, _ in pdfs:
+            remove_upload(path)
+        raise
+    return pdfs
+
+
+async def extract_batch_file(name: str, pdf_path: str, content_hash: str, semaphore: asyncio.Semaphore):
+    """Extract one PDF of a batch, going through the result cache"""
+    document_hash.set(content_hash)
+    async with semaphore:
+        try:
+            cache_key = result_cache.make_key(content_hash, 'auto', pages=None, normalize=False, layout="rows")
+            result = await asyncio.to_thread(result_cache.get, cache_key)
+            if result is None:
+                result = await run_extraction(pdf_path)
+                await asyncio.to_thread(result_cache.put, cache_key, result)
+        except Exception as e:
+            print(f"Batch extraction failed for {name}: {e}")
+            result = {"status": "error", "message": str(getattr(e, 'detail', e))}
+        finally:
+            remove_upload(pdf_path)
+    
+    return {"file": name, **result}
+
+
+async def stream_batch(pdfs: List[Tuple[str, str, str]], persist: bool):
+    """Extract a batch of PDFs, largest first, streaming each result as NDJSON when it finishes
+    
+    The last line summarises the batch and, with persist, the id of the
+    combined extraction_logs record holding every file's rows.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    # Start the largest files first so the workers stay busy to the end
+    pdfs = sorted(pdfs, key=lambda pdf: os.path.getsize(pdf[1]), reverse=True)
+    tasks = [
+        asyncio.create_task(extract_batch_file(name, path, content_hash, semaphore))
+        for name, path, content_hash in pdfs
+    ]
+    
+    combined_rows = []
+    columns = []
+    succeeded = 0
+    
+    try:
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            yield json.dumps(result) + "\n"
+            
+            if result["status"] == "success":
+                succeeded += 1
+                if persist:
+                    for column in result["columns"]:
+                        if column not in columns:
+                            columns.append(column)
+                    combined_rows.extend(
+                        {**row, "source_file": result["file"]} for row in result["data"]
+                    )
+        
+        summary = {
+            "status": "batch_complete",
+            "files": len(pdfs),
+            "succeeded": succeeded,
+            "rows": len(combined_rows) if persist else None,
+            "extraction_id": None
+        }
+        
+        if persist and combined_rows:
+            try:
+                summary["extraction_id"] = await asyncio.to_thread(
+                    save_extraction,
+                    f"batch of {len(pdfs)} files",
+                    "batch",
+                    columns + ["source_file"],
+                    combined_rows
+                )
+            except HTTPException as e:
+                summary["batch_error"] = e.detail
+        
+        yield json.dumps(summary) + "\n"
+    
+    finally:
+        for task in tasks:
+            task.cancel()
+        for _, path, _ in pdfs:
+            remove_upload(path)
+        release_extraction_slot()
+
+
+def build_self_check_pdf() -> bytes:
+    """Build a one-page PDF holding a small ruled 3x2 table"""
+    ops = []
+    for i in range(4):
+        ops.append(f"50 {742 - i * 20} m 250 {742 - i * 20} l S")
+    for i in range(3):
+        ops.append(f"{50 + i * 100} 742 m {50 + i * 100} 682 l S")
+    cells = [["District", "Cases"], ["North", "12"], ["South", "7"]]
+    for r, row in enumerate(cells):
+        for c, text in enumerate(row):
+            ops.append(f"BT /F1 10 Tf {54 + c * 100} {728 - r * 20} Td ({text}) Tj ET")
+    stream = "\n".join(ops).encode("latin-1")
+    
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    ]
+    
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, xref_offset
+    )
+    return bytes(pdf)
+
+
+def start_tabula_engine():
+    """Start the tabula engine once and verify it can extract a known table"""
+    if tabula_engine['mode'] == 'jpype':
+        try:
+            import jpype  # noqa: F401
+        except ImportError:
+            print("jpype is not installed, tabula will launch java per request")
+            tabula_engine['mode'] = 'subprocess'
+    
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+            tmp.write(build_self_check_pdf())
+            pdf_path = tmp.name
+        
+        while True:
+            try:
+                started = time.perf_counter()
+                tables = read_pdf_with_tabula(pdf_path)
+                tabula_engine['startup_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                
+                if tables and tables[0].shape == (2, 2):
+                    tabula_engine['ready'] = True
+                    tabula_engine['self_check'] = 'passed'
+                else:
+                    tabula_engine['self_check'] = 'failed: unexpected table shape'
+                break
+            except Exception as e:
+                tabula_engine['self_check'] = f"failed: {e}"
+                print(f"Tabula self-check failed ({tabula_engine['mode']}): {e}")
+                
+                # The JVM could not be embedded, try launching java instead
+                if tabula_engine['mode'] != 'jpype':
+                    break
+                tabula_engine['mode'] = 'subprocess'
+    finally:
+        if 'pdf_path' in locals() and os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+    
+    print(f"Tabula engine: mode={tabula_engine['mode']}, self-check={tabula_engine['self_check']}")
+    return tabula_engine['ready']
 
-# Create tables on startup
-create_tables()
 
 app = FastAPI(
     title="PDF Table Extractor API",
@@ -86,6 +3408,65 @@ app = FastAPI(
 )
 
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject uploads whose declared size is over the limit before reading the body"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > MAX_UPLOAD_MB * 1024 * 1024 + UPLOAD_CHUNK_SIZE:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File too large. The maximum upload size is {MAX_UPLOAD_MB} MB."}
+            )
+    return await call_next(request)
+
+
+async def warm_up():
+    """Start the worker fork server, then boot tabula (which loads pandas)"""
+    try:
+        await asyncio.to_thread(start_fork_server)
+        readiness['workers'] = True
+    except Exception as e:
+        print(f"Worker fork server failed to start: {e}")
+    
+    try:
+        await asyncio.to_thread(start_tabula_engine)
+    finally:
+        readiness['tabula'] = True
+        tabula_booted.set()
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start the job workers; the engines and the MySQL schema come up in the background
+    
+    Nothing here waits on java, the fork server or MySQL, so /health answers
+    as soon as the server listens and /ready reports when the rest is up.
+    """
+    global job_wakeup, tabula_booted
+    start_worker_pools()
+    create_jobs_table()
+    
+    job_wakeup = asyncio.Event()
+    tabula_booted = asyncio.Event()
+    background_tasks.append(asyncio.create_task(warm_up()))
+    background_tasks.append(asyncio.create_task(prepare_database()))
+    for _ in range(JOB_WORKERS):
+        job_workers.append(asyncio.create_task(job_worker()))
+    if JOB_RETENTION_HOURS > 0:
+        background_tasks.append(asyncio.create_task(job_janitor()))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background tasks, the job workers and the extraction worker pools"""
+    for task in background_tasks + job_workers:
+        task.cancel()
+    background_tasks.clear()
+    job_workers.clear()
+    stop_worker_pools()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -310,6 +3691,10 @@ async def web_ui():
                 background: #f59e0b;
             }
             
+            .badge.error {
+                background: #ef4444;
+            }
+            
             pre {
                 background: #1e1e1e;
                 color: #d4d4d4;
@@ -406,56 +3791,39 @@ async def web_ui():
                 extractBtn.disabled = true;
                 
                 try {
-                    // 1. Extract Data
-                    const response = await fetch('/extract', {
+                    // Extract and save to the database on the server
+                    const response = await fetch('/extract?persist=true', {
                         method: 'POST',
                         body: formData
                     });
                     
-                    const data = await response.json();
+                    let data = await response.json();
+                    let valSaveStatus = `<span class="badge success">✓ Saved to Database (#${data.extraction_id})</span>`;
+                    
+                    // The extraction worked but MySQL did not take it: show the
+                    // rows anyway (the server has them cached) and the save error
+                    const errorDetail = data.detail || data.message || "Unknown Error";
+                    if (!response.ok && response.status === 500 && String(errorDetail).startsWith('Database')) {
+                        const retryData = new FormData();
+                        retryData.append('file', pdfFile.files[0]);
+                        const extractResponse = await fetch('/extract', {
+                            method: 'POST',
+                            body: retryData
+                        });
+                        data = await extractResponse.json();
+                        if (!extractResponse.ok) {
+                            throw new Error(data.detail || data.message || "Unknown Error");
+                        }
+                        valSaveStatus = `<span class="badge error" title="${errorDetail}">✗ Not saved: ${errorDetail}</span>`;
+                    } else if (!response.ok) {
+                        throw new Error(errorDetail);
+                    }
                     
                     loading.style.display = 'none';
                     result.style.display = 'block';
                     
                     if (data.status === 'success') {
-                        // 2. Save to Database Automatically
-                        let valSaveStatus = '<span class="badge warning">Saving to DB...</span>';
-                        
-                        // Render initial result while saving happens in background
                         renderResult(data, valSaveStatus);
-                        
-                        try {
-                            const saveResponse = await fetch('/save-to-db', {
-                                method: 'POST',
-                                headers: {
-                                    'Content-Type': 'application/json'
-                                },
-                                body: JSON.stringify({
-                                    filename: pdfFile.files[0].name,
-                                    method: data.method,
-                                    rows: data.rows,
-                                    columns: data.columns,
-                                    data: data.data
-                                })
-                            });
-                            
-                            const saveData = await saveResponse.json();
-                            
-                            if (saveResponse.ok && saveData.status === 'success') {
-                                valSaveStatus = '<span class="badge success">✓ Saved to Database</span>';
-                            } else {
-                                const errorDetail = saveData.detail || saveData.message || "Unknown DB Error";
-                                valSaveStatus = `<span class="badge error" title="${errorDetail}">✗ ${errorDetail}</span>`;
-                            }
-                            
-                            // Re-render with new status
-                            renderResult(data, valSaveStatus);
-                            
-                        } catch (dbError) {
-                            console.error("DB Save Error", dbError);
-                            valSaveStatus = '<span class="badge error">✗ Connection Refused</span>';
-                            renderResult(data, valSaveStatus);
-                        }
 
                     } else {
                         result.className = 'result error';
@@ -502,8 +3870,8 @@ async def web_ui():
                             <div class="stat-label">Columns Found</div>
                         </div>
                         <div class="stat-card">
-                            <div class="stat-value">${data.method}</div>
-                            <div class="stat-label">Method Used</div>
+                            <div class="stat-value">${data.engine || data.method}</div>
+                            <div class="stat-label" title="${data.engine_reason || ''}">Method Used</div>
                         </div>
                     </div>
                     
@@ -535,17 +3903,49 @@ async def web_ui():
 
 @app.get("/health")
 async def health_check():
-    """Health check for Railway"""
+    """Liveness check for Railway, answers as soon as the server is up"""
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness check: 200 once the worker fork server is up and the tabula
+    boot has finished, 503 while they are still starting
+    
+    MySQL is reported but does not gate readiness, extraction works
+    without it.
+    """
+    ready = readiness['workers'] and readiness['tabula']
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "starting",
+            "workers": readiness['workers'],
+            "tabula": tabula_engine['ready'] if readiness['tabula'] else "starting",
+            "database": readiness['database']
+        }
+    )
+
+
 @app.get("/test-extract")
-async def test_extract_pdf(pdf_path: str) -> Dict[str, Any]:
+async def test_extract_pdf(
+    pdf_path: str,
+    pages: Optional[str] = None,
+    strategy: str = Query(EXTRACTION_STRATEGY, pattern="^(auto|race)$"),
+    normalize: bool = NORMALIZE_TABLES,
+    layout: str = Query("rows", pattern="^(rows|tables)$"),
+    _slot: None = Depends(extraction_slot)
+) -> Dict[str, Any]:
     """
     Test endpoint: Extract tables from a local PDF file (for local testing only)
     
     Args:
         pdf_path: Full path to PDF file on your local system
+        pages: Optional page range such as "1-3,5"
+        strategy: "auto" (engines one after another) or "race" (all at once)
+        normalize: Drop repeated headers, align columns and type number/date columns
+        layout: "rows" (all tables in one list) or "tables" (each table apart)
         
     Example:
         http://127.0.0.1:8000/test-extract?pdf_path=C:/Users/YourName/Desktop/sample.pdf
@@ -569,62 +3969,15 @@ async def test_extract_pdf(pdf_path: str) -> Dict[str, Any]:
         )
     
     try:
-        # Try extraction with tabula-py first
-        try:
-            tables = tabula.read_pdf(
-                pdf_path,
-                pages="all",
-                lattice=True,
-                multiple_tables=True,
-                silent=True
-            )
-            
-            if tables and len(tables) > 0:
-                df = pd.concat(tables, ignore_index=True)
-                df = df.fillna("")
-                
-                return {
-                    "status": "success",
-                    "method": "tabula",
-                    "file": pdf_path,
-                    "rows": len(df),
-                    "columns": df.columns.tolist(),
-                    "data": df.to_dict(orient="records")
-                }
-        except Exception as tabula_error:
-            print(f"Tabula extraction failed: {tabula_error}")
-            
-            # Fallback to pdfplumber
-            try:
-                all_tables = []
-                with pdfplumber.open(pdf_path) as pdf:
-                    for page in pdf.pages:
-                        tables = page.extract_tables()
-                        if tables:
-                            for table in tables:
-                                all_tables.extend(table)
-                
-                if all_tables:
-                    df = pd.DataFrame(all_tables[1:], columns=all_tables[0])
-                    df = df.fillna("")
-                    
-                    return {
-                        "status": "success",
-                        "method": "pdfplumber",
-                        "file": pdf_path,
-                        "rows": len(df),
-                        "columns": df.columns.tolist(),
-                        "data": df.to_dict(orient="records")
-                    }
-            except Exception as pdfplumber_error:
-                print(f"PDFPlumber extraction failed: {pdfplumber_error}")
-        
-        return {
-            "status": "no_tables",
-            "file": pdf_path,
-            "message": "No tables found in the PDF file"
-        }
+        result = await run_extraction(
+            pdf_path, await resolve_pages(pdf_path, pages), strategy, normalize, layout
+        )
+        result["file"] = pdf_path
+        return result
         
+    except HTTPException:
+        raise
+    
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -633,19 +3986,51 @@ async def test_extract_pdf(pdf_path: str) -> Dict[str, Any]:
 
 
 @app.post("/extract")
-async def extract_pdf(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def extract_pdf(
+    request: Request,
+    file: UploadFile = File(...),
+    persist: bool = False,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    pages: Optional[str] = None,
+    since_page: Optional[int] = Query(None, ge=1),
+    extraction_id: Optional[int] = None,
+    strategy: str = Query(EXTRACTION_STRATEGY, pattern="^(auto|race)$"),
+    normalize: bool = NORMALIZE_TABLES,
+    layout: str = Query("rows", pattern="^(rows|tables)$"),
+    _slot: None = Depends(extraction_slot)
+):
     """
     Extract tables from uploaded PDF file
     
     Args:
         file: PDF file uploaded via multipart/form-data
+        persist: Save the result to MySQL on the server and return only a
+            summary with the extraction_id instead of the rows
+        format: "ndjson" (or an Accept: application/x-ndjson header) streams
+            one JSON row per line as pages are extracted
+        pages: Page range to extract, such as "1-3,5" or "10-"
+        since_page: Extract only from this page to the end (incremental mode)
+        extraction_id: Append the extracted rows to this saved extraction
+            instead of creating a new one (implies persist)
+        strategy: "auto" tries the pre-scan's engines one after another,
+            "race" runs them at once and keeps the first usable result
+            (JSON responses only; streams and jobs use "auto")
+        normalize: Drop repeated header rows, line up the columns of every
+            table, strip whitespace and return number and date columns as
+            numbers and ISO dates, with their types in column_types
+            (not applied to NDJSON streams, which send rows as extracted)
+        layout: "rows" puts the rows of every table into one list, "tables"
+            returns each table on its own with its page, bbox (x0, top, x1,
+            bottom in points) and columns, and persists them as separate
+            records (JSON responses and jobs, strategy "auto")
         
     Returns:
         JSON object containing:
         - status: success or no_tables
         - rows: number of rows extracted
         - columns: list of column names
-        - data: list of dictionaries with table data
+        - data: list of dictionaries with table data (omitted when persist=true)
+        - extraction_id: id of the saved extraction (only when persist=true)
     """
     
     # Validate file type
@@ -655,71 +4040,118 @@ async def extract_pdf(file: UploadFile = File(...)) -> Dict[str, Any]:
             detail="Invalid file type. Please upload a PDF file."
         )
     
+    if pages is not None and since_page is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="Use either pages or since_page, not both."
+        )
+    
+    if extraction_id is not None:
+        persist = True
+    
+    wants_ndjson = format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+    if wants_ndjson and persist:
+        raise HTTPException(
+            status_code=400,
+            detail="persist=true is not supported with NDJSON streaming."
+        )
+    
+    if layout == "tables" and (wants_ndjson or extraction_id is not None or strategy == "race"):
+        raise HTTPException(
+            status_code=400,
+            detail="layout=tables is not supported with NDJSON streaming, extraction_id or strategy=race."
+        )
+    
+    # Large uploads go to the job queue instead of holding the request open
+    if (not wants_ndjson and ASYNC_JOB_THRESHOLD_MB and file.size
+            and file.size > ASYNC_JOB_THRESHOLD_MB * 1024 * 1024):
+        return JSONResponse(
+            status_code=202,
+            content=await submit_job(file, pages, since_page, persist, extraction_id, normalize, layout)
+        )
+    
+    if wants_ndjson:
+        # The temp file must outlive this handler, the stream removes it
+        pdf_path, content_hash = await save_upload(file, reuse_spooled=False)
+        document_hash.set(content_hash)
+        try:
+            page_list = await resolve_pages(pdf_path, pages, since_page)
+        except BaseException:
+            remove_upload(pdf_path)
+            raise
+        
+        # Streams are cached as sent: per-table rows, not /extract's
+        # rows lined up under the columns of every table
+        cache_key = result_cache.make_key(content_hash, 'stream', pages=page_list)
+        cached = await asyncio.to_thread(result_cache.get, cache_key)
+        if cached is not None:
+            remove_upload(pdf_path)
+            return StreamingResponse(
+                iter([cached["ndjson"]]),
+                media_type="application/x-ndjson"
+            )
+        
+        reserve_extraction_slot(check=False)
+        return StreamingResponse(
+            stream_upload_rows(pdf_path, page_list, cache_key),
+            media_type="application/x-ndjson"
+        )
+    
     # Create temporary file to save uploaded PDF
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            content = await file.read()
-            tmp.write(content)
-            pdf_path = tmp.name
+        pdf_path, content_hash = await save_upload(file)
+        document_hash.set(content_hash)
+        page_list = await resolve_pages(pdf_path, pages, since_page)
+        if extraction_id is not None and page_list == []:
+            # Polled with no new pages since since_page
+            return await asyncio.to_thread(append_no_pages, extraction_id)
         
-        # Try extraction with tabula-py first (best for structured tables)
-        try:
-            tables = tabula.read_pdf(
-                pdf_path,
-                pages="all",
-                lattice=True,
-                multiple_tables=True,
-                silent=True
+        cache_key = result_cache.make_key(content_hash, strategy, pages=page_list,
+                                          normalize=normalize, layout=layout)
+        result = await asyncio.to_thread(result_cache.get, cache_key)
+        
+        if result is None:
+            result = await run_extraction(pdf_path, page_list, strategy, normalize, layout)
+            await asyncio.to_thread(result_cache.put, cache_key, result)
+        
+        if persist and result["status"] == "success" and layout == "tables":
+            log_id = await asyncio.to_thread(
+                save_extraction_tables,
+                file.filename,
+                result["method"],
+                result["tables"]
             )
-            
-            if tables and len(tables) > 0:
-                # Concatenate all tables
-                df = pd.concat(tables, ignore_index=True)
-                
-                # Clean the data
-                df = df.fillna("")
-                
-                return {
-                    "status": "success",
-                    "method": "tabula",
-                    "rows": len(df),
-                    "columns": df.columns.tolist(),
-                    "data": df.to_dict(orient="records")
-                }
-        except Exception as tabula_error:
-            print(f"Tabula extraction failed: {tabula_error}")
-            
-            # Fallback to pdfplumber
-            try:
-                all_tables = []
-                with pdfplumber.open(pdf_path) as pdf:
-                    for page in pdf.pages:
-                        tables = page.extract_tables()
-                        if tables:
-                            for table in tables:
-                                all_tables.extend(table)
-                
-                if all_tables:
-                    # Convert to DataFrame
-                    df = pd.DataFrame(all_tables[1:], columns=all_tables[0])
-                    df = df.fillna("")
-                    
-                    return {
-                        "status": "success",
-                        "method": "pdfplumber",
-                        "rows": len(df),
-                        "columns": df.columns.tolist(),
-                        "data": df.to_dict(orient="records")
-                    }
-            except Exception as pdfplumber_error:
-                print(f"PDFPlumber extraction failed: {pdfplumber_error}")
+            result = persisted_tables_summary(result, log_id)
+        elif persist and result["status"] == "success":
+            if extraction_id is not None:
+                log_id = await asyncio.to_thread(
+                    append_to_extraction,
+                    extraction_id,
+                    result["columns"],
+                    result["data"]
+                )
+            else:
+                log_id = await asyncio.to_thread(
+                    save_extraction,
+                    file.filename,
+                    result["method"],
+                    result["columns"],
+                    result["data"]
+                )
+            result = {
+                "status": "success",
+                "method": result["method"],
+                "rows": result["rows"],
+                "columns": result["columns"],
+                "extraction_id": log_id,
+                "appended": extraction_id is not None
+            }
         
-        # If both methods fail, return no tables found
-        return {
-            "status": "no_tables",
-            "message": "No tables found in the PDF file"
-        }
+        return result
         
+    except HTTPException:
+        raise
+    
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -728,12 +4160,17 @@ async def extract_pdf(file: UploadFile = File(...)) -> Dict[str, Any]:
     
     finally:
         # Clean up temporary file
-        if 'pdf_path' in locals() and os.path.exists(pdf_path):
-            os.unlink(pdf_path)
+        if 'pdf_path' in locals():
+            remove_upload(pdf_path)
 
 
 @app.post("/extract-tabula")
-async def extract_with_tabula(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def extract_with_tabula(
+    file: UploadFile = File(...),
+    pages: Optional[str] = None,
+    normalize: bool = NORMALIZE_TABLES,
+    _slot: None = Depends(extraction_slot)
+) -> Dict[str, Any]:
     """
     Extract tables using tabula-py only (for structured PDFs with clear table borders)
     """
@@ -741,38 +4178,36 @@ async def extract_with_tabula(file: UploadFile = File(...)) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail="Invalid file type")
     
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(await file.read())
-            pdf_path = tmp.name
+        pdf_path, content_hash = await save_upload(file)
+        page_list = await resolve_pages(pdf_path, pages)
+        cache_key = result_cache.make_key(content_hash, 'tabula', pages=page_list, normalize=normalize)
+        result = await asyncio.to_thread(result_cache.get, cache_key)
+        if result is not None:
+            return result
         
-        tables = tabula.read_pdf(
-            pdf_path,
-            pages="all",
-            lattice=True,
-            multiple_tables=True,
-            silent=True
-        )
+        tables = await run_tabula(pdf_path, pages=page_list or "all") if page_list != [] else []
         
         if not tables:
-            return {"status": "no_tables"}
-        
-        df = pd.concat(tables, ignore_index=True)
-        df = df.fillna("")
+            result = {"status": "no_tables"}
+        else:
+            result = frame_result(tables_to_frame(tables, normalize), "tabula", with_method=False,
+                                  normalized=normalize)
         
-        return {
-            "status": "success",
-            "rows": len(df),
-            "columns": df.columns.tolist(),
-            "data": df.to_dict(orient="records")
-        }
+        await asyncio.to_thread(result_cache.put, cache_key, result)
+        return result
         
     finally:
-        if 'pdf_path' in locals() and os.path.exists(pdf_path):
-            os.unlink(pdf_path)
+        if 'pdf_path' in locals():
+            remove_upload(pdf_path)
 
 
 @app.post("/extract-pdfplumber")
-async def extract_with_pdfplumber(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def extract_with_pdfplumber(
+    file: UploadFile = File(...),
+    pages: Optional[str] = None,
+    normalize: bool = NORMALIZE_TABLES,
+    _slot: None = Depends(extraction_slot)
+) -> Dict[str, Any]:
     """
     Extract tables using pdfplumber only (for PDFs without clear borders)
     """
@@ -780,63 +4215,202 @@ async def extract_with_pdfplumber(file: UploadFile = File(...)) -> Dict[str, Any
         raise HTTPException(status_code=400, detail="Invalid file type")
     
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(await file.read())
-            pdf_path = tmp.name
+        pdf_path, content_hash = await save_upload(file)
+        document_hash.set(content_hash)
+        page_list = await resolve_pages(pdf_path, pages)
+        cache_key = result_cache.make_key(content_hash, 'pdfplumber', pages=page_list, normalize=normalize)
+        result = await asyncio.to_thread(result_cache.get, cache_key)
+        if result is not None:
+            return result
         
-        all_tables = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                tables = page.extract_tables()
-                if tables:
-                    for table in tables:
-                        all_tables.extend(table)
+        all_tables = await run_pdfplumber(pdf_path, page_list) if page_list != [] else []
         
         if not all_tables:
-            return {"status": "no_tables"}
-        
-        df = pd.DataFrame(all_tables[1:], columns=all_tables[0])
-        df = df.fillna("")
+            result = {"status": "no_tables"}
+        else:
+            result = frame_result(rows_to_frame(all_tables, normalize), "pdfplumber", with_method=False,
+                                  normalized=normalize)
         
-        return {
-            "status": "success",
-            "rows": len(df),
-            "columns": df.columns.tolist(),
-            "data": df.to_dict(orient="records")
-        }
+        await asyncio.to_thread(result_cache.put, cache_key, result)
+        return result
         
     finally:
-        if 'pdf_path' in locals() and os.path.exists(pdf_path):
-            os.unlink(pdf_path)
+        if 'pdf_path' in locals():
+            remove_upload(pdf_path)
+
+
+@app.post("/extract-batch")
+async def extract_batch(
+    files: List[UploadFile] = File(...),
+    persist: bool = True,
+    _slot: None = Depends(extraction_slot)
+):
+    """
+    Extract tables from many PDFs in one request
+    
+    Accepts any number of PDF files and/or ZIP archives of PDFs. Files are
+    scheduled across BATCH_CONCURRENCY workers, largest first, and each
+    file's result is streamed back as one NDJSON line as soon as it is done.
+    With persist (the default) all rows are also saved as one combined
+    extraction_logs batch record, each row tagged with its source_file.
+    """
+    pdfs = []
+    try:
+        for file in files:
+            filename = file.filename.lower()
+            if filename.endswith('.pdf'):
+                pdf_path, content_hash = await save_upload(file, reuse_spooled=False)
+                pdfs.append((file.filename, pdf_path, content_hash))
+            elif filename.endswith('.zip'):
+                zip_path, _ = await save_upload(file, reuse_spooled=False)
+                try:
+                    pdfs.extend(await asyncio.to_thread(unpack_zip_pdfs, zip_path))
+                except zipfile.BadZipFile:
+                    raise HTTPException(status_code=400, detail=f"Invalid ZIP file: {file.filename}")
+                finally:
+                    remove_upload(zip_path)
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid file type: {file.filename}. Please upload PDF or ZIP files."
+                )
+    except BaseException:
+        for _, path, _ in pdfs:
+            remove_upload(path)
+        raise
+    
+    if not pdfs:
+        raise HTTPException(status_code=400, detail="No PDF files found in the upload")
+    
+    # The stream holds its own queue slot and removes the temp files
+    reserve_extraction_slot(check=False)
+    return StreamingResponse(
+        stream_batch(pdfs, persist),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def create_extraction_job(
+    file: UploadFile = File(...),
+    pages: Optional[str] = None,
+    since_page: Optional[int] = Query(None, ge=1),
+    persist: bool = False,
+    extraction_id: Optional[int] = None,
+    normalize: bool = NORMALIZE_TABLES,
+    layout: str = Query("rows", pattern="^(rows|tables)$")
+) -> Dict[str, Any]:
+    """
+    Queue a PDF for background extraction and return its job id at once
+    
+    Takes the same pages / since_page / persist / extraction_id / normalize
+    / layout options as /extract. Poll /jobs/{job_id} for progress.
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Invalid file type")
+    
+    if pages is not None and since_page is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="Use either pages or since_page, not both."
+        )
+    
+    if layout == "tables" and extraction_id is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="layout=tables is not supported with extraction_id."
+        )
+    
+    return await submit_job(file, pages, since_page, persist, extraction_id, normalize, layout)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Status and progress of a background extraction job"""
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    pages_total = job['pages_total']
+    return {
+        "job_id": job['id'],
+        "filename": job['filename'],
+        "status": job['status'],
+        "pages_done": job['pages_done'],
+        "pages_total": pages_total,
+        "progress": round(job['pages_done'] / pages_total, 3) if pages_total else 0.0,
+        "result_url": f"/jobs/{job_id}/result" if job['status'] == 'done' else None,
+        "extraction_id": job['extraction_id'],
+        "error": job['error'],
+        "created_at": job['created_at'],
+        "updated_at": job['updated_at']
+    }
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Result of a finished job, in the same format as /extract"""
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job['status'] != 'done':
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    
+    return FileResponse(job['result_path'], media_type="application/json")
+
+
+@app.get("/tabula-status")
+async def check_tabula_status():
+    """Check the state of the long-lived tabula engine"""
+    return tabula_engine
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage timings and extraction counters"""
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+@app.get("/cache-stats")
+async def check_cache_stats():
+    """Hit and miss counters for the extraction result cache and the parsed page cache"""
+    return {**result_cache.stats(), "page_cache": page_cache.stats()}
+
+
+def read_database_status() -> Dict[str, Any]:
+    """MySQL connection status, for /db-status"""
+    with db_connection() as connection:
+        if connection:
+            try:
+                cursor = connection.cursor()
+                cursor.execute("SELECT VERSION()")
+                version = cursor.fetchone()
+                cursor.close()
+                return {
+                    "status": "connected",
+                    "database": MYSQL_CONFIG['database'],
+                    "host": MYSQL_CONFIG['host'],
+                    "mysql_version": version[0] if version else "Unknown",
+                    "pool_size": MYSQL_POOL_SIZE
+                }
+            except Error as e:
+                return {
+                    "status": "error",
+                    "message": str(e)
+                }
+        else:
+            return {
+                "status": "disconnected",
+                "message": "Could not connect to MySQL. Please check your .env configuration."
+            }
 
 
 @app.get("/db-status")
 async def check_database_status():
     """Check MySQL database connection status"""
-    connection = get_db_connection()
-    if connection:
-        try:
-            cursor = connection.cursor()
-            cursor.execute("SELECT VERSION()")
-            version = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            return {
-                "status": "connected",
-                "database": MYSQL_CONFIG['database'],
-                "host": MYSQL_CONFIG['host'],
-                "mysql_version": version[0] if version else "Unknown"
-            }
-        except Error as e:
-            return {
-                "status": "error",
-                "message": str(e)
-            }
-    else:
-        return {
-            "status": "disconnected",
-            "message": "Could not connect to MySQL. Please check your .env configuration."
-        }
+    # Pool checkout can wait up to MYSQL_POOL_TIMEOUT, keep it off the event loop
+    return await asyncio.to_thread(read_database_status)
 
 
 class ExtractionRequest(BaseModel):
@@ -851,123 +4425,313 @@ async def save_extraction_to_db(request: ExtractionRequest):
     """
     Save extracted PDF data to MySQL database
     """
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(
-            status_code=500,
-            detail="Database connection failed. Please check MySQL configuration."
-        )
+    log_id = await asyncio.to_thread(
+        save_extraction,
+        request.filename,
+        request.method,
+        request.columns,
+        request.data
+    )
     
-    try:
-        cursor = connection.cursor()
-        
-        # Insert into extraction_logs
-        cursor.execute("""
-            INSERT INTO extraction_logs 
-            (filename, extraction_method, rows_count, columns_count, status)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (request.filename, request.method, request.rows, len(request.columns), 'success'))
-        
-        log_id = cursor.lastrowid
-        
-        # Insert each row into extracted_data
-        for row in request.data:
-            cursor.execute("""
-                INSERT INTO extracted_data (extraction_log_id, row_data)
-                VALUES (%s, %s)
-            """, (log_id, json.dumps(row)))
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
-        
-        return {
-            "status": "success",
-            "message": f"Saved {request.rows} rows to database",
-            "extraction_id": log_id
-        }
+    return {
+        "status": "success",
+        "message": f"Saved {request.rows} rows to database",
+        "extraction_id": log_id
+    }
+
+
+def read_extraction_logs(where: str, params: List[Any], limit: int) -> List[Dict[str, Any]]:
+    """Fetch up to limit extraction logs matching where, newest first"""
+    with db_connection() as connection:
+        if not connection:
+            raise HTTPException(status_code=500, detail="Database connection failed")
         
-    except Error as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Database error: {str(e)}"
-        )
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(f"""
+                SELECT id, filename, extraction_method, rows_count, 
+                       columns_count, layout, extracted_at, status
+                FROM extraction_logs
+                {where}
+                ORDER BY extracted_at DESC, id DESC
+                LIMIT %s
+            """, params + [limit])
+            
+            extractions = cursor.fetchall()
+            cursor.close()
+            
+        except Error as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return extractions
 
 
 @app.get("/extractions")
-async def get_all_extractions():
-    """Get all extraction logs from database"""
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
+async def get_all_extractions(
+    limit: int = Query(EXTRACTIONS_PAGE_LIMIT, ge=1, le=500),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """Get extraction logs from database, newest first, one page at a time"""
+    where = ""
+    params = []
+    if after:
+        # Cursor is "<extracted_at>_<id>" of the last log on the previous page
+        try:
+            after_at, after_id = after.rsplit('_', 1)
+            params = [datetime.strptime(after_at, '%Y-%m-%dT%H:%M:%S'), int(after_id)]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        where = "WHERE extracted_at < %s OR (extracted_at = %s AND id < %s)"
+        params = [params[0], params[0], params[1]]
     
-    try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, filename, extraction_method, rows_count, 
-                   columns_count, extracted_at, status
-            FROM extraction_logs
-            ORDER BY extracted_at DESC
-        """)
-        
-        extractions = cursor.fetchall()
-        cursor.close()
-        connection.close()
-        
-        # Convert datetime to string for JSON serialization
-        for extraction in extractions:
-            if extraction.get('extracted_at'):
-                extraction['extracted_at'] = extraction['extracted_at'].strftime('%Y-%m-%d %H:%M:%S')
-        
-        return {"extractions": extractions}
+    # One extra row tells whether another page follows
+    extractions = await asyncio.to_thread(read_extraction_logs, where, params, limit + 1)
+    next_cursor = None
+    if len(extractions) > limit:
+        extractions = extractions[:limit]
+        last = extractions[-1]
+        next_cursor = f"{last['extracted_at']:%Y-%m-%dT%H:%M:%S}_{last['id']}"
+    
+    # Convert datetime to string for JSON serialization
+    for extraction in extractions:
+        if extraction.get('extracted_at'):
+            extraction['extracted_at'] = extraction['extracted_at'].strftime('%Y-%m-%d %H:%M:%S')
+    
+    return {"extractions": extractions, "next_cursor": next_cursor}
+
+
+def fetch_table_records(cursor, extraction_id: int, page: Optional[int] = None) -> List[Dict[str, Any]]:
+    """The table records of an extraction without their rows, optionally of one page"""
+    cursor.execute("""
+        SELECT table_index, page, bbox, column_names, rows_count FROM extracted_tables
+        WHERE extraction_log_id = %s AND (%s IS NULL OR page = %s)
+        ORDER BY table_index
+    """, (extraction_id, page, page))
+    return cursor.fetchall()
+
+def table_summary(extraction_id: int, record: Dict[str, Any]) -> Dict[str, Any]:
+    """One extracted_tables record as listed by the API, with the URL of its rows"""
+    return {
+        "index": record['table_index'],
+        "page": record['page'],
+        "bbox": json.loads(record['bbox']),
+        "columns": json.loads(record['column_names']),
+        "rows": record['rows_count'],
+        "url": f"/extraction/{extraction_id}/tables/{record['table_index']}"
+    }
+
+def read_extraction(extraction_id: int, after: Optional[int], limit: int) -> Tuple[Dict[str, Any], List[Dict[str, Any]], Optional[int], Optional[List[Dict[str, Any]]]]:
+    """Fetch an extraction log and one page of its rows, with the next cursor
+    
+    A layout=tables extraction keeps its rows per table: it comes back
+    without rows but with its table records, None for other extractions.
+    """
+    with db_connection() as connection:
+        if not connection:
+            raise HTTPException(status_code=500, detail="Database connection failed")
         
-    except Error as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=True)
+            
+            # Get extraction log
+            cursor.execute("""
+                SELECT * FROM extraction_logs WHERE id = %s
+            """, (extraction_id,))
+            log = cursor.fetchone()
+            
+            if not log:
+                raise HTTPException(status_code=404, detail="Extraction not found")
+            
+            if log.get('layout') == 'tables':
+                tables = fetch_table_records(cursor, extraction_id)
+                cursor.close()
+                return log, [], None, tables
+            
+            # Blob rows are paged by position, extracted_data rows by id
+            offset = after or 0
+            data = load_columnar_rows(connection, extraction_id, offset=offset, limit=limit + 1)
+            if data is not None:
+                next_cursor = offset + limit if len(data) > limit else None
+                data = data[:limit]
+            else:
+                cursor.execute("""
+                    SELECT id, row_data FROM extracted_data 
+                    WHERE extraction_log_id = %s AND id > %s
+                    ORDER BY id
+                    LIMIT %s
+                """, (extraction_id, after or 0, limit + 1))
+                rows = cursor.fetchall()
+                next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+                
+                # Parse JSON data
+                data = [json.loads(row['row_data']) for row in rows[:limit]]
+            cursor.close()
+            
+        except Error as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return log, data, next_cursor, None
 
 
 @app.get("/extraction/{extraction_id}")
-async def get_extraction_data(extraction_id: int):
-    """Get specific extraction data by ID"""
-    connection = get_db_connection()
-    if not connection:
-        raise HTTPException(status_code=500, detail="Database connection failed")
+async def get_extraction_data(
+    extraction_id: int,
+    limit: int = Query(EXTRACTION_ROWS_PAGE_LIMIT, ge=1, le=10000),
+    after: Optional[int] = Query(None, ge=0, description="next_cursor from the previous page")
+):
+    """Get specific extraction data by ID, one page of rows at a time
     
-    try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get extraction log
-        cursor.execute("""
-            SELECT * FROM extraction_logs WHERE id = %s
-        """, (extraction_id,))
-        log = cursor.fetchone()
-        
-        if not log:
-            raise HTTPException(status_code=404, detail="Extraction not found")
-        
-        # Get extraction data
-        cursor.execute("""
-            SELECT row_data FROM extracted_data 
-            WHERE extraction_log_id = %s
-        """, (extraction_id,))
-        
-        rows = cursor.fetchall()
-        cursor.close()
-        connection.close()
-        
-        # Parse JSON data
-        data = [json.loads(row['row_data']) for row in rows]
+    A layout=tables extraction has no rows here; it lists its tables
+    instead, each with the URL of its rows.
+    """
+    log, data, next_cursor, tables = await asyncio.to_thread(read_extraction, extraction_id, after, limit)
+    
+    # Convert datetime
+    if log.get('extracted_at'):
+        log['extracted_at'] = log['extracted_at'].strftime('%Y-%m-%d %H:%M:%S')
+    
+    result = {
+        "log": log,
+        "data": data,
+        "next_cursor": next_cursor
+    }
+    if tables is not None:
+        result["tables"] = [table_summary(extraction_id, record) for record in tables]
+    return result
+
+
+def read_extraction_tables(extraction_id: int, page: Optional[int]) -> List[Dict[str, Any]]:
+    """Fetch the table records of an extraction, optionally of one page"""
+    with db_connection() as connection:
+        if not connection:
+            raise HTTPException(status_code=500, detail="Database connection failed")
         
-        # Convert datetime
-        if log.get('extracted_at'):
-            log['extracted_at'] = log['extracted_at'].strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=True)
+            cursor.execute("""
+                SELECT id FROM extraction_logs WHERE id = %s
+            """, (extraction_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail="Extraction not found")
+            
+            records = fetch_table_records(cursor, extraction_id, page)
+            cursor.close()
+            
+        except Error as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return records
+
+
+@app.get("/extraction/{extraction_id}/tables")
+async def get_extraction_tables(
+    extraction_id: int,
+    page: Optional[int] = Query(None, ge=1)
+):
+    """List the tables of a layout=tables extraction (page, bbox, columns, row count) without their rows"""
+    records = await asyncio.to_thread(read_extraction_tables, extraction_id, page)
+    
+    return {
+        "extraction_id": extraction_id,
+        "tables": [table_summary(extraction_id, record) for record in records]
+    }
+
+
+def read_extraction_table(extraction_id: int, table_index: int) -> Optional[Dict[str, Any]]:
+    """Fetch one table record of an extraction, None if there is no such table"""
+    with db_connection() as connection:
+        if not connection:
+            raise HTTPException(status_code=500, detail="Database connection failed")
         
-        return {
-            "log": log,
-            "data": data
-        }
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=True)
+            cursor.execute("""
+                SELECT table_index, page, bbox, column_names, rows_count, format, column_schema, data
+                FROM extracted_tables
+                WHERE extraction_log_id = %s AND table_index = %s
+            """, (extraction_id, table_index))
+            record = cursor.fetchone()
+            cursor.close()
+            
+        except Error as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return record
+
+
+@app.get("/extraction/{extraction_id}/tables/{table_index}")
+async def get_extraction_table(
+    extraction_id: int,
+    table_index: int,
+    limit: int = Query(EXTRACTION_ROWS_PAGE_LIMIT, ge=1, le=10000),
+    after: Optional[int] = Query(None, ge=0, description="next_cursor from the previous page")
+):
+    """Get the rows of one table of a layout=tables extraction, one page at a time"""
+    record = await asyncio.to_thread(read_extraction_table, extraction_id, table_index)
+    if not record:
+        raise HTTPException(status_code=404, detail="Table not found")
+    
+    # Rows are paged by position within the table
+    offset = after or 0
+    data = decode_table_rows(record['format'], record['column_schema'], record['data'], offset, limit)
+    
+    return {
+        "extraction_id": extraction_id,
+        "index": record['table_index'],
+        "page": record['page'],
+        "bbox": json.loads(record['bbox']),
+        "columns": json.loads(record['column_names']),
+        "rows": record['rows_count'],
+        "data": data,
+        "next_cursor": offset + limit if offset + limit < record['rows_count'] else None
+    }
+
+
+def read_export_log(extraction_id: int) -> Dict[str, Any]:
+    """Fetch the log of an extraction about to be exported, 404 if there is none"""
+    with db_connection() as connection:
+        if not connection:
+            raise HTTPException(status_code=500, detail="Database connection failed")
         
-    except Error as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=True)
+            cursor.execute("""
+                SELECT id, column_names, layout FROM extraction_logs WHERE id = %s
+            """, (extraction_id,))
+            log = cursor.fetchone()
+            cursor.close()
+        except Error as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    if not log:
+        raise HTTPException(status_code=404, detail="Extraction not found")
+    if log['layout'] == 'tables':
+        raise HTTPException(
+            status_code=409,
+            detail=f"Extraction {extraction_id} was saved with layout=tables; "
+                   f"read its tables from /extraction/{extraction_id}/tables/{{index}}."
+        )
+    return log
+
+
+@app.get("/extraction/{extraction_id}/export")
+async def export_extraction(
+    extraction_id: int,
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$")
+):
+    """Download a saved extraction as CSV, NDJSON or Parquet, streamed from MySQL"""
+    log = await asyncio.to_thread(read_export_log, extraction_id)
+    
+    media_types = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+        'parquet': 'application/vnd.apache.parquet'
+    }
+    download_name = f"extraction_{extraction_id}.{format}"
+    
+    # The stream checks out its own connection, so a client that goes away
+    # before the first chunk never holds one
+    return StreamingResponse(
+        stream_export(extraction_id, format, log['column_names']),
+        media_type=media_types[format],
+        headers={"Content-Disposition": f'attachment; filename="{download_name}"'}
+    )
 
 
 @app.get("/view-extractions", response_class=HTMLResponse)
@@ -1181,34 +4945,60 @@ async def view_extractions_ui():
         </div>
         
         <script>
+            // Pages are fetched lazily with the next_cursor of the previous one
+            let extractionsCursor = null;
+            let loadedExtractions = 0;
+            let loadedRows = 0;
+            let dataCursor = null;
+            let dataColumns = [];
+            let dataUrl = null;
+            
+            function loadMoreButton(id, label, onclick) {
+                return `<div style="text-align: center; margin-top: 15px;">
+                    <button id="${id}" onclick="${onclick}" style="
+                        background: #667eea; color: white; border: none;
+                        padding: 10px 20px; border-radius: 8px; cursor: pointer;
+                    ">${label}</button>
+                </div>`;
+            }
+            
             async function loadExtractions() {
+                const listContainer = document.getElementById('extractionsList');
+                const statsContainer = document.getElementById('stats');
+                const more = document.getElementById('moreExtractions');
+                if (more) more.parentElement.remove();
+                
                 try {
-                    const response = await fetch('/extractions');
+                    const url = extractionsCursor
+                        ? `/extractions?after=${encodeURIComponent(extractionsCursor)}`
+                        : '/extractions';
+                    const response = await fetch(url);
                     const result = await response.json();
                     
-                    const listContainer = document.getElementById('extractionsList');
-                    const statsContainer = document.getElementById('stats');
-                    
-                    if (result.extractions.length === 0) {
-                        listContainer.innerHTML = '<div class="empty">No extractions found. Upload a PDF to get started!</div>';
-                        return;
+                    if (!extractionsCursor) {
+                        listContainer.innerHTML = '';
+                        if (result.extractions.length === 0) {
+                            listContainer.innerHTML = '<div class="empty">No extractions found. Upload a PDF to get started!</div>';
+                            return;
+                        }
                     }
                     
-                    // Show stats
-                    const totalRows = result.extractions.reduce((sum, e) => sum + e.rows_count, 0);
+                    // Show stats for what is loaded so far
+                    loadedExtractions += result.extractions.length;
+                    loadedRows += result.extractions.reduce((sum, e) => sum + e.rows_count, 0);
                     statsContainer.innerHTML = `
                         <div class="stat-card">
-                            <div class="stat-value">${result.extractions.length}</div>
+                            <div class="stat-value">${loadedExtractions}${result.next_cursor ? '+' : ''}</div>
                             <div class="stat-label">Total Extractions</div>
                         </div>
                         <div class="stat-card">
-                            <div class="stat-value">${totalRows}</div>
+                            <div class="stat-value">${loadedRows}${result.next_cursor ? '+' : ''}</div>
                             <div class="stat-label">Total Rows Extracted</div>
                         </div>
                     `;
                     
                     // Show extractions
-                    listContainer.innerHTML = result.extractions.map(ext => `
+                    listContainer.insertAdjacentHTML('beforeend', result.extractions.map(ext => `
                         <div class="extraction-card" onclick="viewExtraction(${ext.id})">
                             <h3>📄 ${ext.filename}</h3>
                             <div class="extraction-meta">
@@ -1219,7 +5009,13 @@ async def view_extractions_ui():
                                 <div><span class="badge">${ext.status}</span></div>
                             </div>
                         </div>
-                    `).join('');
+                    `).join(''));
+                    
+                    extractionsCursor = result.next_cursor;
+                    if (extractionsCursor) {
+                        listContainer.insertAdjacentHTML('beforeend',
+                            loadMoreButton('moreExtractions', 'Load more extractions', 'loadExtractions()'));
+                    }
                     
                 } catch (error) {
                     document.getElementById('extractionsList').innerHTML = 
@@ -1227,6 +5023,14 @@ async def view_extractions_ui():
                 }
             }
             
+            function rowsHTML(rows) {
+                return rows.map(row => `
+                    <tr>
+                        ${dataColumns.map(col => `<td>${row[col] ?? ''}</td>`).join('')}
+                    </tr>
+                `).join('');
+            }
+            
             async function viewExtraction(id) {
                 const dataView = document.getElementById('dataView');
                 dataView.innerHTML = '<div class="loading"><div class="spinner"></div><p>Loading data...</p></div>';
@@ -1236,13 +5040,21 @@ async def view_extractions_ui():
                     const response = await fetch(`/extraction/${id}`);
                     const result = await response.json();
                     
+                    // layout=tables extractions keep their rows per table
+                    if (result.tables) {
+                        showTables(result);
+                        return;
+                    }
+                    
                     if (result.data.length === 0) {
                         dataView.innerHTML = '<div class="empty">No data found</div>';
                         return;
                     }
                     
                     // Get column names
-                    const columns = Object.keys(result.data[0]);
+                    dataColumns = Object.keys(result.data[0]);
+                    dataCursor = result.next_cursor;
+                    dataUrl = `/extraction/${id}`;
                     
                     // Build table
                     const tableHTML = `
@@ -1256,18 +5068,15 @@ async def view_extractions_ui():
                             <table>
                                 <thead>
                                     <tr>
-                                        ${columns.map(col => `<th>${col}</th>`).join('')}
+                                        ${dataColumns.map(col => `<th>${col}</th>`).join('')}
                                     </tr>
                                 </thead>
-                                <tbody>
-                                    ${result.data.map(row => `
-                                        <tr>
-                                            ${columns.map(col => `<td>${row[col] || ''}</td>`).join('')}
-                                        </tr>
-                                    `).join('')}
+                                <tbody id="dataRows">
+                                    ${rowsHTML(result.data)}
                                 </tbody>
                             </table>
                         </div>
+                        ${dataCursor ? loadMoreButton('moreRows', 'Load more rows', 'loadMoreRows()') : ''}
                     `;
                     
                     dataView.innerHTML = tableHTML;
@@ -1278,6 +5087,92 @@ async def view_extractions_ui():
                 }
             }
             
+            function showTables(result) {
+                const dataView = document.getElementById('dataView');
+                if (result.tables.length === 0) {
+                    dataView.innerHTML = '<div class="empty">No data found</div>';
+                    return;
+                }
+                
+                dataView.innerHTML = `
+                    <h2>Extraction Details  for: ${result.log.filename}</h2>
+                    <p style="margin: 10px 0; color: #666;">
+                        Extracted on: ${result.log.extracted_at} | 
+                        Method: ${result.log.extraction_method} | 
+                        Rows: ${result.log.rows_count} | 
+                        Tables: ${result.tables.length}
+                    </p>
+                    ${result.tables.map(table => `
+                        <div class="extraction-card" onclick="viewTable('${table.url}')">
+                            <h3>Table ${table.index + 1} (page ${table.page})</h3>
+                            <div class="extraction-meta">
+                                <div><strong>Rows:</strong> ${table.rows}</div>
+                                <div><strong>Columns:</strong> ${table.columns.join(', ')}</div>
+                            </div>
+                        </div>
+                    `).join('')}
+                    <div id="tableView"></div>
+                `;
+                dataView.scrollIntoView({ behavior: 'smooth' });
+            }
+            
+            async function viewTable(url) {
+                const tableView = document.getElementById('tableView');
+                tableView.innerHTML = '<div class="loading"><div class="spinner"></div><p>Loading table...</p></div>';
+                
+                try {
+                    const response = await fetch(url);
+                    const result = await response.json();
+                    
+                    dataColumns = result.columns;
+                    dataCursor = result.next_cursor;
+                    dataUrl = url;
+                    
+                    tableView.innerHTML = `
+                        <div class="table-container">
+                            <table>
+                                <thead>
+                                    <tr>
+                                        ${dataColumns.map(col => `<th>${col}</th>`).join('')}
+                                    </tr>
+                                </thead>
+                                <tbody id="dataRows">
+                                    ${rowsHTML(result.data)}
+                                </tbody>
+                            </table>
+                        </div>
+                        ${dataCursor ? loadMoreButton('moreRows', 'Load more rows', 'loadMoreRows()') : ''}
+                    `;
+                    tableView.scrollIntoView({ behavior: 'smooth' });
+                    
+                } catch (error) {
+                    tableView.innerHTML = '<div class="empty">Error loading table: ' + error.message + '</div>';
+                }
+            }
+            
+            async function loadMoreRows() {
+                const button = document.getElementById('moreRows');
+                button.disabled = true;
+                button.textContent = 'Loading...';
+                
+                try {
+                    const response = await fetch(`${dataUrl}?after=${dataCursor}`);
+                    const result = await response.json();
+                    
+                    document.getElementById('dataRows').insertAdjacentHTML('beforeend', rowsHTML(result.data));
+                    dataCursor = result.next_cursor;
+                    if (dataCursor) {
+                        button.disabled = false;
+                        button.textContent = 'Load more rows';
+                    } else {
+                        button.parentElement.remove();
+                    }
+                } catch (error) {
+                    button.disabled = false;
+                    button.textContent = 'Retry loading rows';
+                }
+            }
+            
             // Load on page load
             loadExtractions();
         </script>